@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from typing import Dict, List, Optional
+
+from benchmarks.synthetic import generate_bdd100k, generate_inoutdoor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name: (dataset, arguments of convert.py)
+SCENARIOS = {
+    'bdd100k-coco': ('bdd100k', ['--format', 'coco']),
+    'bdd100k-yolo': ('bdd100k', ['--format', 'yolo']),
+    'bdd100k-coco-yolo': ('bdd100k', ['--format', 'coco', 'yolo']),
+    'bdd100k-consolidated': ('bdd100k', ['--format', 'coco',
+                                         '--consolidated-labels']),
+    'bdd100k-annotations-only': ('bdd100k', ['--format', 'coco', 'yolo',
+                                             '--annotations-only']),
+    'inoutdoor-coco': ('inoutdoor', ['--format', 'coco']),
+    'inoutdoor-yolo': ('inoutdoor', ['--format', 'yolo',
+                                     '--modality', 'depth']),
+}
+
+
+def _proc_children() -> Dict[int, List[int]]:
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(entry), 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # the command name in parentheses may contain spaces
+        ppid = int(stat[stat.rindex(')') + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _proc_io(pid: int) -> Optional[Dict[str, int]]:
+    try:
+        with open('/proc/{}/io'.format(pid), 'r') as f:
+            return {k: int(v) for k, v in
+                    (line.split(': ') for line in f.read().splitlines())}
+    except (OSError, ValueError):
+        return None
+
+
+def run_measured(args: List[str], cwd: str,
+                 interval: float = 0.05) -> dict:
+    """
+    Runs a command and measures its wall time, the peak resident set size
+    of the process and its descendants and the bytes they read and wrote.
+
+    The bytes are the rchar/wchar counters of /proc/{pid}/io, sampled every
+    interval seconds for the process tree, so I/O of a worker in the last
+    interval before it exits may be missed. They count all reads and
+    writes, cached or not, including the ones of the python start up.
+    """
+    io = {}
+    start = time.time()
+    process = subprocess.Popen(args, cwd=cwd, stdout=subprocess.DEVNULL)
+    while True:
+        pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        if pid != 0:
+            break
+        if os.path.exists('/proc/{}/io'.format(process.pid)):
+            children = _proc_children()
+            pending = [process.pid]
+            while pending:
+                p = pending.pop()
+                counters = _proc_io(p)
+                if counters is not None:
+                    io[p] = counters
+                pending += children.get(p, [])
+        time.sleep(interval)
+    elapsed = time.time() - start
+    # wait4 already reaped the process
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError('{} failed with exit code {}'.format(
+            ' '.join(args), process.returncode))
+    return {
+        'seconds': elapsed,
+        # kilobytes on linux
+        'peak_rss_mb': rusage.ru_maxrss / 1024.,
+        'bytes_read': sum(c.get('rchar', 0) for c in io.values()),
+        'bytes_written': sum(c.get('wchar', 0) for c in io.values()),
+    }
+
+
+def folder_size(path: str) -> int:
+    size = 0
+    for folder, _, files in os.walk(path):
+        for f in files:
+            p = os.path.join(folder, f)
+            if not os.path.islink(p):
+                size += os.path.getsize(p)
+    return size
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description='Measures the throughput of convert.py on synthetic '
+                    'BDD100K and InOutDoor datasets')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS),
+                        default=sorted(SCENARIOS))
+    parser.add_argument('--images', type=int, default=1000,
+                        help='images per fold (default: 1000)')
+    parser.add_argument('--boxes', type=int, default=10,
+                        help='mean number of boxes per image (default: 10)')
+    parser.add_argument('--image-size', type=int, nargs=2,
+                        default=[640, 360], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs per scenario, the fastest is reported')
+    parser.add_argument('--work-dir', default=None,
+                        help='folder for the datasets and outputs, a '
+                             'temporary folder which is removed by default')
+    parser.add_argument('--output', default=None,
+                        help='json file for the results')
+    parser.add_argument('convert_args', nargs=argparse.REMAINDER,
+                        help='further arguments of convert.py, after --')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    convert_args = [a for a in args.convert_args if a != '--']
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='convert_bench_')
+
+    datasets = {}
+    try:
+        for name in args.scenarios:
+            dataset, scenario_args = SCENARIOS[name]
+            if dataset not in datasets:
+                path = os.path.join(work_dir, 'data', dataset)
+                shutil.rmtree(path, ignore_errors=True)
+                start = time.time()
+                if dataset == 'bdd100k':
+                    stats = generate_bdd100k(
+                        path, {'train': args.images, 'val': args.images},
+                        tuple(args.image_size), args.boxes, args.seed)
+                else:
+                    stats = generate_inoutdoor(
+                        path, {'train': args.images, 'test': args.images},
+                        tuple(args.image_size), args.boxes, args.seed)
+                print('Generated {} with {} images and {} boxes in '
+                      '{:.1f}s'.format(dataset, stats['images'],
+                                       stats['boxes'], time.time() - start))
+                datasets[dataset] = (path, stats)
+
+            path, stats = datasets[dataset]
+            best = None
+            for _ in range(args.repeat):
+                out = os.path.join(work_dir, 'out', name)
+                shutil.rmtree(out, ignore_errors=True)
+                os.makedirs(out)
+                metrics_file = '{}.metrics.json'.format(out)
+                res = run_measured(
+                    [sys.executable, os.path.join(ROOT, 'convert.py'),
+                     '--dataset', dataset, '--dataset-path', path,
+                     '--workers', str(args.workers),
+                     '--metrics', metrics_file] +
+                    scenario_args + convert_args, cwd=out)
+                res['output_bytes'] = folder_size(out)
+                with open(metrics_file, 'r') as f:
+                    res['metrics'] = json.load(f)
+                if best is None or res['seconds'] < best['seconds']:
+                    best = res
+            best['images_per_second'] = stats['images'] / best['seconds']
+            best['boxes_per_second'] = stats['boxes'] / best['seconds']
+            datasets[dataset][1].setdefault('results', {})[name] = best
+            print('{:26s} {:9.1f} images/s {:10.1f} boxes/s '
+                  '{:8.1f} MB peak rss {:9.1f} MB read {:9.1f} MB written'
+                  .format(name, best['images_per_second'],
+                          best['boxes_per_second'], best['peak_rss_mb'],
+                          best['bytes_read'] / 2. ** 20,
+                          best['bytes_written'] / 2. ** 20))
+            print('{:26s} {}'.format('', ', '.join(
+                '{} {:.2f}s'.format(stage, entry['seconds'])
+                for stage, entry in best['metrics']['stages'].items())))
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'arguments': vars(args),
+                'datasets': {dataset: stats for dataset, (_, stats)
+                             in datasets.items()}
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import io
+import json
+import os
+import random
+
+from typing import Dict, Tuple
+
+from utils.fs import mkdir_p
+from utils.readers import DEEPDRIVE_LABELS, INOUTDOOR_MODALITIES, \
+    InOutDoorReader
+
+
+def _encode_image(size: Tuple[int, int], image_format: str,
+                  seed: int) -> bytes:
+    """
+    :return: a noise image, which does not compress to nothing
+    """
+    from PIL import Image
+    rnd = random.Random(seed)
+    pil_im = Image.frombytes(
+        'RGB', size, bytes(rnd.getrandbits(8)
+                           for _ in range(size[0] * size[1] * 3)))
+    f = io.BytesIO()
+    pil_im.save(f, image_format)
+    return f.getvalue()
+
+
+def _write(path: str, data: bytes) -> int:
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def generate_bdd100k(root: str, images: Dict[str, int],
+                     image_size: Tuple[int, int] = (1280, 720),
+                     boxes: int = 10, seed: int = 0,
+                     version: str = '100k') -> dict:
+    """
+    Writes a BDD100K like dataset to root: for every fold the jpeg images
+    and the per frame json labels with frames[0].objects[].box2d, a few
+    objects without box2d (lanes) included, and the consolidated
+    bdd100k_labels_images_{fold}.json. All images share the same content.
+    The output only depends on the arguments.
+
+    :param images: {fold: number of images}
+    :param boxes: mean number of boxes per image
+    :return: {'images': n, 'boxes': n, 'bytes': n} of the dataset
+    """
+    rnd = random.Random(seed)
+    image_data = _encode_image(image_size, 'JPEG', seed)
+    width, height = image_size
+    stats = {'images': 0, 'boxes': 0, 'bytes': 0}
+    for fold, n in sorted(images.items()):
+        image_path = os.path.join(root, 'images', 'bdd100k', 'images',
+                                  version, fold)
+        label_path = os.path.join(root, 'labels', 'bdd100k', 'labels',
+                                  version, fold)
+        mkdir_p(image_path)
+        mkdir_p(label_path)
+        frames = []
+        for i in range(n):
+            name = '{:08x}-{:08x}'.format(seed, i)
+            objects = []
+            for k in range(rnd.randint(0, 2 * boxes)):
+                x1 = rnd.uniform(0, width - 2)
+                y1 = rnd.uniform(0, height - 2)
+                objects += [{
+                    'category': rnd.choice(DEEPDRIVE_LABELS),
+                    'id': k,
+                    'attributes': {'occluded': False, 'truncated': False},
+                    'box2d': {
+                        'x1': x1, 'y1': y1,
+                        'x2': rnd.uniform(x1 + 1, width),
+                        'y2': rnd.uniform(y1 + 1, height)
+                    }
+                }]
+            stats['boxes'] += len(objects)
+            objects += [{'category': 'lane/single white', 'id': len(objects),
+                         'poly2d': [[0.0, 0.0, 'L'], [1.0, 1.0, 'L']]}]
+
+            stats['bytes'] += _write(
+                os.path.join(image_path, '{}.jpg'.format(name)), image_data)
+            stats['bytes'] += _write(
+                os.path.join(label_path, '{}.json'.format(name)),
+                json.dumps({
+                    'name': name,
+                    'frames': [{'timestamp': 10000, 'objects': objects}]
+                }).encode('utf-8'))
+            frames += [{'name': '{}.jpg'.format(name),
+                        'attributes': {'weather': 'clear'},
+                        'timestamp': 10000,
+                        'labels': objects}]
+        stats['bytes'] += _write(
+            os.path.join(root, 'labels', 'bdd100k', 'labels',
+                         'bdd100k_labels_images_{}.json'.format(fold)),
+            json.dumps(frames).encode('utf-8'))
+        stats['images'] += n
+    return stats
+
+
+def generate_inoutdoor(root: str, images: Dict[str, int],
+                       image_size: Tuple[int, int] = (960, 540),
+                       boxes: int = 3, seed: int = 0,
+                       empty_fraction: float = 0.2) -> dict:
+    """
+    Writes an InOutDoor like dataset to root: the image sets
+    ImageSets/seq*.txt of the folds of InOutDoorReader, a yaml annotation
+    per image with the boxes in 1920x1080 coordinates and a png per image
+    and modality. All images share the same content. The output only
+    depends on the arguments.
+
+    :param images: {fold: number of images}, spread over the sequences of
+        the fold
+    :param boxes: mean number of boxes of the images with persons
+    :param empty_fraction: fraction of the images without any person
+    :return: {'images': n, 'boxes': n, 'bytes': n} of the dataset
+    """
+    rnd = random.Random(seed)
+    image_data = _encode_image(image_size, 'PNG', seed)
+    width, height = InOutDoorReader.annotation_size
+    for folder in ['Annotations', 'ImageSets'] + \
+            list(INOUTDOOR_MODALITIES.values()):
+        mkdir_p(os.path.join(root, folder))
+
+    stats = {'images': 0, 'boxes': 0, 'bytes': 0}
+    for fold, n in sorted(images.items()):
+        sequences = InOutDoorReader.sequences[fold]
+        for s, sequence in enumerate(sequences):
+            seq_name = os.path.splitext(sequence)[0]
+            count = n // len(sequences) + (s < n % len(sequences))
+            names = ['{}_{:06d}'.format(seq_name, i) for i in range(count)]
+            with open(os.path.join(root, 'ImageSets', sequence), 'w') as f:
+                for name in names:
+                    f.write('{}\n'.format(name))
+
+            for name in names:
+                lines = ['annotation:',
+                         '  filename: {}.png'.format(name),
+                         '  size:',
+                         '    width: {}'.format(width),
+                         '    height: {}'.format(height)]
+                k = 0 if rnd.random() < empty_fraction else \
+                    rnd.randint(1, 2 * boxes - 1)
+                if k:
+                    lines += ['  object:']
+                for _ in range(k):
+                    x = rnd.randint(0, width - 2)
+                    y = rnd.randint(0, height - 2)
+                    lines += [
+                        '    - name: person',
+                        '      bndbox:',
+                        "        xmin: '{}'".format(x),
+                        "        ymin: '{}'".format(y),
+                        "        xmax: '{}'".format(rnd.randint(x + 1, width)),
+                        "        ymax: '{}'".format(rnd.randint(y + 1, height))
+                    ]
+                stats['boxes'] += k
+                stats['bytes'] += _write(
+                    os.path.join(root, 'Annotations', '{}.yml'.format(name)),
+                    '\n'.join(lines + ['']).encode('utf-8'))
+                for folder in INOUTDOOR_MODALITIES.values():
+                    stats['bytes'] += _write(
+                        os.path.join(root, folder, '{}.png'.format(name)),
+                        image_data)
+            stats['images'] += count
+    return stats
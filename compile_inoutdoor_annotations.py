@@ -0,0 +1,24 @@
+import argparse
+import os
+
+from utils.annotation_cache import compile_annotations
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Parses all InOutDoor annotation files into a single '
+                    'cache file, which the converters read with '
+                    '--annotation-cache')
+    parser.add_argument('cache_file')
+    parser.add_argument('--dataset-path', default=None,
+                        help='root of the dataset (default: '
+                             '~/dataset/inoutdoorpeoplergbd)')
+    args = parser.parse_args()
+
+    dataset_path = args.dataset_path or os.path.expanduser(
+        os.path.join('~', 'dataset', 'inoutdoorpeoplergbd'))
+    label_path = os.path.join(dataset_path, 'Annotations')
+
+    cache = compile_annotations(label_path, args.cache_file)
+    print('{} annotation files cached in {}'.format(
+        len(cache.entries), args.cache_file))
@@ -0,0 +1,271 @@
+import argparse
+import cProfile
+import json
+import os
+
+from utils.boxes import BoxValidator
+from utils.categories import UNKNOWN_POLICIES, CategoryRegistry
+from utils.ids import ID_SCHEMES
+from utils.imagesize import ImageSizeCache
+from utils.materialize import MATERIALIZE_MODES
+from utils.metrics import Metrics
+from utils.pipeline import convert
+from utils.readers import BDD100KReader, DEEPDRIVE_LABELS, \
+    INOUTDOOR_LABELS, INOUTDOOR_MODALITIES, INOUTDOOR_MODALITY_GROUPS, \
+    InOutDoorReader
+from utils.sinks import SINKS, PairIndexSink
+from utils.subset import STRATIFICATIONS, Subset
+
+DATASETS = ['bdd100k', 'inoutdoor']
+# where the lists of the RGB-D image pairs of a format are written
+PAIR_INDEX_PATHS = {
+    'coco': os.path.join('.', '{}', 'rgbd'),
+    'yolo': os.path.join('.', '{}_yolo', 'data', 'rgbd'),
+}
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description='Converts BDD100K or InOutDoor to the COCO and/or the '
+                    'darknet format in a single pass over the data')
+    parser.add_argument('--dataset', choices=DATASETS, required=True)
+    parser.add_argument('--format', choices=sorted(SINKS.keys()), nargs='+',
+                        default=['coco'],
+                        help='output formats, all are written in the same '
+                             'pass (default: coco)')
+    parser.add_argument('--dataset-path', default=None,
+                        help='root of the dataset (default: ~/.deepdrive or '
+                             '~/dataset/inoutdoorpeoplergbd)')
+    parser.add_argument('--consolidated-labels', action='store_true',
+                        help='read the BDD100K labels from the '
+                             'bdd100k_labels_images_{fold}.json files '
+                             'instead of one json file per image')
+    parser.add_argument('--category-alias', action='append', default=[],
+                        metavar='SOURCE=TARGET',
+                        help='export the category SOURCE as TARGET, which '
+                             'may be another or a new category, e.g. '
+                             'bike=two-wheeler motor=two-wheeler merges '
+                             'both (repeatable)')
+    parser.add_argument('--unknown-labels', choices=UNKNOWN_POLICIES,
+                        default='collect',
+                        help='what to do with boxes of unknown categories: '
+                             'stop with an error, skip them or skip them '
+                             'and report the names (default: collect)')
+    parser.add_argument('--modality', nargs='+', default=['rgb'],
+                        choices=sorted(list(INOUTDOOR_MODALITIES.keys()) +
+                                       list(INOUTDOOR_MODALITY_GROUPS.keys())),
+                        help='InOutDoor images to export, several modalities '
+                             'share one pass over the annotations; rgbd '
+                             'exports rgb and depth with a list of the '
+                             'image pairs (default: rgb)')
+    parser.add_argument('--subset-size', type=int, default=None,
+                        help='only convert a random subset of this many '
+                             'images per fold, chosen from the label '
+                             'summary written by --format summary')
+    parser.add_argument('--subset-fraction', type=float, default=None,
+                        help='only convert this share of the images per '
+                             'fold, see --subset-size')
+    parser.add_argument('--subset-seed', type=int, default=0,
+                        help='seed of the subset selection (default: 0)')
+    parser.add_argument('--subset-stratify', choices=STRATIFICATIONS,
+                        default=None,
+                        help='draw the subset proportionally from the '
+                             'InOutDoor sequences or by the rarest category '
+                             'of every image')
+    parser.add_argument('--subset-summary', default=None,
+                        help='folder of the label summary (default: '
+                             './{dataset}_summary)')
+    parser.add_argument('--no-box-validation', action='store_true',
+                        help='export the boxes as they are instead of '
+                             'fixing swapped corners, clipping them to the '
+                             'image and dropping degenerate boxes')
+    parser.add_argument('--min-box-area', type=float, default=0.,
+                        help='drop boxes with a smaller area in pixels '
+                             '(default: 0)')
+    parser.add_argument('--min-box-size', type=float, default=0.,
+                        help='drop boxes with a smaller width or height in '
+                             'pixels (default: 0)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes used to convert '
+                             'the images (default: 1, no pool)')
+    parser.add_argument('--materialize', choices=MATERIALIZE_MODES,
+                        default=None,
+                        help='how the images are placed in the export '
+                             '(default: transcode-only-if-needed for '
+                             'bdd100k, copy for inoutdoor)')
+    parser.add_argument('--annotations-only', action='store_true',
+                        help='only write the annotation files, same as '
+                             '--materialize none')
+    parser.add_argument('--size-cache', default=None,
+                        help='json file which caches the image dimensions '
+                             'between runs')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only convert the images whose image or label '
+                             'file changed since the last run and take the '
+                             'others from the existing output')
+    parser.add_argument('--manifest-hash', action='store_true',
+                        help='also store content hashes in the manifest, '
+                             'files which were only touched are then not '
+                             'converted again')
+    parser.add_argument('--annotation-cache', default=None,
+                        help='json lines file with the parsed InOutDoor '
+                             'annotation files, see '
+                             'compile_inoutdoor_annotations.py')
+    parser.add_argument('--coco-shards', type=int, default=1,
+                        help='split the COCO annotations of a fold into '
+                             'this many files with an index, see '
+                             'merge_coco_shards.py (default: 1)')
+    parser.add_argument('--coco-binary', action='store_true',
+                        help='also write the COCO annotations as memory '
+                             'mappable arrays, see utils/coco_binary.py')
+    parser.add_argument('--coco-lookup', action='store_true',
+                        help='also write the annotation ids per image, the '
+                             'image ids per category and the id lookups as '
+                             'a sidecar, see utils/coco_index.py')
+    parser.add_argument('--coco-ids', choices=ID_SCHEMES,
+                        default='sequential',
+                        help='sequential: image ids continue over the '
+                             'folds, annotation ids are counted in image '
+                             'order; hash: ids derived from the image '
+                             'file names, stable when images are added or '
+                             'removed (default: sequential)')
+    parser.add_argument('--yolo-archive', action='store_true',
+                        help='pack the darknet label files of a fold into '
+                             'a single tar archive')
+    parser.add_argument('--yolo-image-size', type=int, nargs=2,
+                        default=None, metavar=('WIDTH', 'HEIGHT'),
+                        help='scale the darknet images down to fit into '
+                             'this size, keeping the aspect ratio')
+    parser.add_argument('--yolo-image-format', choices=['.jpg', '.png'],
+                        default=None,
+                        help='encoding of the darknet images (default: the '
+                             'one of the dataset)')
+    parser.add_argument('--yolo-jpeg-quality', type=int, default=None,
+                        help='jpeg quality of the darknet images, forces '
+                             'them to be re-encoded')
+    parser.add_argument('--yolo-writers', type=int, default=4,
+                        help='number of threads writing darknet label files '
+                             '(default: 4)')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='number of reads kept in flight by threads '
+                             'reading the label files and images ahead, '
+                             'for datasets on network file systems '
+                             '(default: 0, no prefetching)')
+    parser.add_argument('--prefetch-memory', type=int, default=256,
+                        help='memory budget of the prefetched files in MB '
+                             '(default: 256)')
+    parser.add_argument('--metrics', default=None,
+                        help='json file for the time spent per stage and '
+                             'the counters of the run')
+    parser.add_argument('--profile', default=None,
+                        help='write cProfile statistics of the main process '
+                             'to this file, use --workers 1 to include the '
+                             'per image work')
+    parser.add_argument('--pairing-report', default=None,
+                        help='json file listing the images without labels '
+                             'and the labels without images of every fold')
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    if args.dataset == 'bdd100k':
+        categories = CategoryRegistry.from_args(
+            DEEPDRIVE_LABELS, args.category_alias, args.unknown_labels)
+        reader = BDD100KReader(args.dataset_path,
+                               consolidated=args.consolidated_labels,
+                               categories=categories)
+    else:
+        categories = CategoryRegistry.from_args(
+            INOUTDOOR_LABELS, args.category_alias, args.unknown_labels)
+        reader = InOutDoorReader(args.dataset_path, modality=args.modality,
+                                 annotation_cache=args.annotation_cache,
+                                 categories=categories)
+        if args.annotation_cache is not None and args.workers > 1:
+            # the files parsed by the workers would not be cached
+            print('Compiling the annotation cache {}'.format(
+                args.annotation_cache))
+            reader.compile_annotations()
+
+    materialize = args.materialize or reader.default_materialize
+    if args.annotations_only:
+        materialize = 'none'
+
+    sink_options = {
+        'coco': {
+            'shards': args.coco_shards,
+            'binary': args.coco_binary,
+            'lookup': args.coco_lookup,
+            'id_scheme': args.coco_ids
+        },
+        'yolo': {
+            'label_archive': args.yolo_archive,
+            'label_writers': args.yolo_writers,
+            'image_size': args.yolo_image_size,
+            'image_format': args.yolo_image_format,
+            'jpeg_quality': args.yolo_jpeg_quality
+        }
+    }
+    sinks = []
+    for f in args.format:
+        by_modality = {}
+        for modality in reader.modalities if SINKS[f].per_modality \
+                else reader.modalities[:1]:
+            by_modality[modality] = SINKS[f](
+                reader, materialize, incremental=args.incremental,
+                manifest_hash=args.manifest_hash, modality=modality,
+                **sink_options.get(f, {}))
+            sinks += [by_modality[modality]]
+        if args.dataset == 'inoutdoor' and 'rgbd' in args.modality and \
+                SINKS[f].per_modality and f in PAIR_INDEX_PATHS:
+            sinks += [PairIndexSink(reader, by_modality['rgb'],
+                                    by_modality['depth'],
+                                    PAIR_INDEX_PATHS[f].format(reader.name))]
+    subset = None
+    if args.subset_size is not None or args.subset_fraction is not None:
+        if 'summary' in args.format:
+            raise ValueError('The label summary can not be written while '
+                             'converting a subset')
+        summary_folder = args.subset_summary or os.path.join(
+            '.', '{}_summary'.format(reader.name))
+        if not os.path.isdir(summary_folder):
+            parser.error('No label summary in {}, write it with --format '
+                         'summary first'.format(summary_folder))
+        subset = Subset(
+            summary_folder,
+            size=args.subset_size, fraction=args.subset_fraction,
+            seed=args.subset_seed, stratify=args.subset_stratify)
+
+    metrics = Metrics()
+    profile = cProfile.Profile() if args.profile is not None else None
+    if profile is not None:
+        profile.enable()
+    try:
+        convert(reader, sinks, workers=args.workers,
+                size_cache=ImageSizeCache(args.size_cache),
+                prefetch=args.prefetch,
+                prefetch_memory=args.prefetch_memory << 20, metrics=metrics,
+                validator=None if args.no_box_validation else BoxValidator(
+                    min_area=args.min_box_area,
+                    min_size=args.min_box_size),
+                subset=subset)
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.profile)
+
+    print(metrics.summary())
+    if args.metrics is not None:
+        metrics.dump(args.metrics)
+
+    if args.pairing_report is not None:
+        with open(args.pairing_report, 'w') as f:
+            json.dump({fold: pairing.report()
+                       for fold, pairing in reader.pairings.items()},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
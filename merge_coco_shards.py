@@ -0,0 +1,25 @@
+import argparse
+
+from utils.coco import merge_coco_shards
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description='Merges the shards of a COCO annotation file written '
+                    'with convert.py --coco-shards into a single file')
+    parser.add_argument('index_file',
+                        help='instances_{fold}{year}.index.json of the shards')
+    parser.add_argument('output_file')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of processes copying the shards '
+                             '(default: 4)')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    merge_coco_shards(args.index_file, args.output_file, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import argparse
+
+from utils.ids import ID_SCHEMES
+from utils.materialize import MATERIALIZE_MODES
+from utils.retarget import coco_to_yolo, yolo_to_coco
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description='Translates an existing export between COCO and the '
+                    'darknet layout, only reading the annotation files')
+    subparsers = parser.add_subparsers(dest='direction')
+    subparsers.required = True
+
+    to_yolo = subparsers.add_parser(
+        'to-yolo', help='darknet labels from COCO annotation files')
+    to_yolo.add_argument('coco_files', nargs='+',
+                         help='instances_{fold}{year}.json files')
+    to_yolo.add_argument('--name', required=True,
+                         help='dataset name of the darknet files, e.g. '
+                              'deepdrive')
+    to_yolo.add_argument('--output-path', default=None,
+                         help='darknet output folder (default: '
+                              './{name}_yolo)')
+    to_yolo.add_argument('--modality', default=None,
+                         help='sub folder of the images and labels, as '
+                              'written by convert.py for InOutDoor')
+    to_yolo.add_argument('--images-path', default=None,
+                         help='folder with the {fold}{year} image folders '
+                              '(default: the parent of the annotations '
+                              'folder)')
+    to_yolo.add_argument('--materialize', choices=MATERIALIZE_MODES,
+                         default='symlink',
+                         help='how the images are made available in the '
+                              'darknet layout (default: symlink)')
+    to_yolo.add_argument('--archive', action='store_true',
+                         help='pack the label files of a fold into a tar '
+                              'archive')
+
+    to_coco = subparsers.add_parser(
+        'to-coco', help='COCO annotation files from darknet labels')
+    to_coco.add_argument('names_file', help='{name}.names of the export')
+    to_coco.add_argument('fold_lists', nargs='+',
+                         help='{name}_{fold}{year}.txt image lists')
+    to_coco.add_argument('--output-path', required=True,
+                         help='COCO output folder, the annotations are '
+                              'written to its annotations folder')
+    to_coco.add_argument('--reference', nargs='+', default=None,
+                         help='COCO files with the image entries, e.g. of an '
+                              'earlier export, the images are probed '
+                              'otherwise')
+    to_coco.add_argument('--ids', choices=ID_SCHEMES, default='sequential',
+                         help='id scheme of the images and annotations, see '
+                              'convert.py --coco-ids (default: sequential)')
+    to_coco.add_argument('--workers', type=int, default=8,
+                         help='threads reading the image headers '
+                              '(default: 8)')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.direction == 'to-yolo':
+        coco_to_yolo(args.coco_files,
+                     args.output_path or './{}_yolo'.format(args.name),
+                     args.name, modality=args.modality,
+                     images_path=args.images_path,
+                     materialize=args.materialize,
+                     label_archive=args.archive)
+    else:
+        yolo_to_coco(args.names_file, args.fold_lists, args.output_path,
+                     references=args.reference, id_scheme=args.ids,
+                     workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
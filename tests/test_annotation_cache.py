@@ -0,0 +1,79 @@
+import os
+import shutil
+
+from utils import annotation_cache
+from utils.annotation_cache import AnnotationCache, compile_annotations
+
+ANNOTATION = b"""annotation:
+  filename: seq0_0000.png
+  object:
+    - name: person
+      bndbox:
+        xmin: '1'
+        ymin: '2'
+        xmax: '3'
+        ymax: '4'
+"""
+
+
+def _dataset(root: str) -> str:
+    label_path = os.path.join(root, 'Annotations')
+    os.makedirs(label_path)
+    for name in ['seq0_0000.yml', 'seq0_0001.yml']:
+        with open(os.path.join(label_path, name), 'wb') as f:
+            f.write(ANNOTATION)
+    return label_path
+
+
+def _count_parses(monkeypatch) -> list:
+    parsed = []
+    load_yaml = annotation_cache.load_yaml
+
+    def counting(path, data):
+        parsed.append(path)
+        return load_yaml(path, data)
+    monkeypatch.setattr(annotation_cache, 'load_yaml', counting)
+    return parsed
+
+
+def test_without_cache_file(tmp_path, monkeypatch):
+    label_path = _dataset(str(tmp_path))
+
+    def stat(path, *args, **kwargs):
+        raise AssertionError('stat of {}'.format(path))
+    monkeypatch.setattr(annotation_cache.os, 'stat', stat)
+    obj = AnnotationCache().load(os.path.join(label_path, 'seq0_0000.yml'))
+    assert obj['annotation']['object'][0]['bndbox']['xmax'] == '3'
+
+
+def test_cache_survives_a_move(tmp_path, monkeypatch):
+    label_path = _dataset(str(tmp_path / 'a'))
+    cache_file = str(tmp_path / 'cache.jsonl')
+    cache = compile_annotations(label_path, cache_file)
+    assert sorted(cache.entries) == ['seq0_0000.yml', 'seq0_0001.yml']
+
+    shutil.move(str(tmp_path / 'a'), str(tmp_path / 'b'))
+    label_path = str(tmp_path / 'b' / 'Annotations')
+    parsed = _count_parses(monkeypatch)
+    cache = AnnotationCache(cache_file, root=label_path)
+    obj = cache.load(os.path.join(label_path, 'seq0_0001.yml'))
+    assert obj['annotation']['filename'] == 'seq0_0000.png'
+    assert parsed == []
+
+
+def test_changed_file_is_parsed_again(tmp_path, monkeypatch):
+    label_path = _dataset(str(tmp_path))
+    cache_file = str(tmp_path / 'cache.jsonl')
+    compile_annotations(label_path, cache_file)
+
+    path = os.path.join(label_path, 'seq0_0000.yml')
+    with open(path, 'wb') as f:
+        f.write(ANNOTATION.replace(b"xmax: '3'", b"xmax: '30'"))
+    parsed = _count_parses(monkeypatch)
+    cache = AnnotationCache(cache_file, root=label_path)
+    obj = cache.load(path)
+    assert obj['annotation']['object'][0]['bndbox']['xmax'] == '30'
+    assert parsed == [path]
+    cache.save()
+    assert AnnotationCache(cache_file, root=label_path).entries[
+        'seq0_0000.yml']['annotation'] == obj
@@ -0,0 +1,51 @@
+import numpy as np
+
+from utils.boxes import BoxArray, BoxValidator
+
+
+def _boxes(rows) -> BoxArray:
+    xmin, ymin, xmax, ymax = zip(*rows)
+    return BoxArray.from_lists(xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax,
+                               label=np.arange(1, len(rows) + 1))
+
+
+def test_valid_boxes_are_kept():
+    boxes = _boxes([(10, 10, 20, 20), (0, 0, 100, 50)])
+    res, fixes = BoxValidator()(boxes, 100, 50)
+    assert res is boxes
+    assert fixes == {}
+
+
+def test_fixes_per_reason():
+    boxes = _boxes([
+        (20, 10, 10, 20),  # swapped
+        (-5, 10, 20, 60),  # clipped
+        (np.nan, 0, 10, 10),  # invalid
+        (10, 10, 10, 20),  # degenerate
+        (1, 1, 2, 2),  # small
+        (30, 30, 40, 40),
+    ])
+    res, fixes = BoxValidator(min_area=4)(boxes, 100, 50)
+    assert fixes == {'box_swapped': 1, 'box_clipped': 1,
+                     'box_dropped_invalid': 1,
+                     'box_dropped_degenerate': 1, 'box_dropped_small': 1}
+    assert res.label.tolist() == [1, 2, 6]
+    assert res.boxes['xmin'].tolist() == [10, 0, 30]
+    assert res.boxes['xmax'].tolist() == [20, 20, 40]
+    assert res.boxes['ymax'].tolist() == [20, 50, 40]
+    # the input is not changed
+    assert boxes.boxes['xmin'][0] == 20
+
+
+def test_without_clipping():
+    boxes = _boxes([(-5, 10, 20, 60)])
+    res, fixes = BoxValidator(clip=False)(boxes, 100, 50)
+    assert res is boxes
+    assert fixes == {}
+
+
+def test_min_size():
+    res, fixes = BoxValidator(min_size=5)(
+        _boxes([(0, 0, 4, 40), (0, 0, 40, 40)]), 100, 50)
+    assert res.label.tolist() == [2]
+    assert fixes == {'box_dropped_small': 1}
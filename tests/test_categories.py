@@ -0,0 +1,73 @@
+import pytest
+
+from utils import metrics
+from utils.categories import CategoryRegistry, UnknownCategoryError
+
+LABELS = ['car', 'bike', 'person', 'motor']
+
+
+@pytest.fixture
+def counters():
+    res = metrics.Metrics()
+    previous = metrics.activate(res)
+    yield res.counters
+    metrics.activate(previous)
+
+
+def test_ids():
+    registry = CategoryRegistry(LABELS)
+    assert registry.coco_categories() == [
+        {'id': 1, 'name': 'car'}, {'id': 2, 'name': 'bike'},
+        {'id': 3, 'name': 'person'}, {'id': 4, 'name': 'motor'}]
+    assert registry.map(['person', 'car', 'car']).tolist() == [3, 1, 1]
+    assert registry.map([]).tolist() == []
+
+
+def test_aliases():
+    # both are merged at the position of bike
+    registry = CategoryRegistry(LABELS, {'bike': 'two-wheeler',
+                                         'motor': 'two-wheeler'})
+    assert registry.labels == ['car', 'two-wheeler', 'person']
+    assert registry.map(['motor', 'bike', 'two-wheeler', 'person']).tolist() \
+        == [2, 2, 2, 3]
+
+
+def test_alias_to_new_and_existing():
+    registry = CategoryRegistry(LABELS, {'person': 'car', 'bus': 'truck'})
+    assert registry.labels == ['car', 'bike', 'motor', 'truck']
+    assert registry.map(['person', 'bus', 'truck']).tolist() == [1, 4, 4]
+
+
+def test_from_args():
+    registry = CategoryRegistry.from_args(LABELS, ['bike=cycle'], 'skip')
+    assert registry.labels == ['car', 'cycle', 'person', 'motor']
+    assert registry.unknown == 'skip'
+    for alias in ['bike', 'bike=', '=cycle']:
+        with pytest.raises(ValueError):
+            CategoryRegistry.from_args(LABELS, [alias])
+
+
+def test_unknown_error(counters):
+    registry = CategoryRegistry(LABELS, unknown='error')
+    with pytest.raises(UnknownCategoryError, match='train'):
+        registry.map(['car', 'train'])
+    assert counters == {}
+
+
+def test_unknown_skip(counters):
+    registry = CategoryRegistry(LABELS, unknown='skip')
+    assert registry.map(['train', 'car', 'boat']).tolist() == [0, 1, 0]
+    assert counters == {'unknown_labels': 2}
+
+
+def test_unknown_collect(counters):
+    registry = CategoryRegistry(LABELS)
+    assert registry.map(['train', 'car', 'train', 'boat']).tolist() == \
+        [0, 1, 0, 0]
+    assert counters == {'unknown_labels': 3, 'unknown_label:train': 2,
+                        'unknown_label:boat': 1}
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        CategoryRegistry(LABELS, unknown='ignore')
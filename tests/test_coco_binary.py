@@ -0,0 +1,100 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from utils import coco_binary
+from utils.boxes import BoxArray
+from utils.coco import CocoWriter
+from utils.coco_binary import CocoBinary, CocoBinaryWriter
+
+INFO = {'description': 'test', 'year': 2017}
+LICENSES = [{'id': 1, 'name': 'test', 'url': ''}]
+CATEGORIES = [{'id': 1, 'name': 'car'}, {'id': 2, 'name': 'person'}]
+
+
+def _write(folder: str, num_images: int):
+    """
+    Writes the same images with CocoWriter and CocoBinaryWriter, some
+    without boxes and one through add_annotation.
+
+    :return: the COCO file and the binary folder
+    """
+    rng = np.random.RandomState(0)
+    coco_file = os.path.join(folder, 'instances_train2017.json')
+    binary_folder = os.path.join(folder, 'instances_train2017.cache')
+    writers = [CocoWriter(coco_file, INFO, LICENSES, CATEGORIES),
+               CocoBinaryWriter(binary_folder, INFO, LICENSES, CATEGORIES)]
+    annotation_id = 1
+    for i in range(num_images):
+        image_id = 100 + i
+        n = rng.randint(0, 4) if i != 1 else 0
+        xmin, ymin = rng.uniform(0, 50, n), rng.uniform(0, 40, n)
+        w, h = rng.uniform(1, 9, n), rng.uniform(1, 9, n)
+        boxes = BoxArray.from_lists(xmin=xmin, xmax=xmin + w, ymin=ymin,
+                                    ymax=ymin + h,
+                                    label=rng.randint(1, 3, n))
+        obj_im = {'license': 1, 'url': '',
+                  'file_name': 'ü{:03d}.jpg'.format(i), 'height': 48,
+                  'width': 64, 'date_captured': '2017-01-01 00:00:00',
+                  'id': image_id}
+        for writer in writers:
+            if i == 2:
+                writer.add_annotation({
+                    'segmentation': [], 'iscrowd': 0, 'image_id': image_id,
+                    'id': annotation_id, 'area': 6.0, 'category_id': 2,
+                    'bbox': [1.0, 2.0, 3.0, 2.0]})
+            writer.add_annotations(image_id, boxes,
+                                   annotation_id + (i == 2))
+            writer.add_image(obj_im)
+        annotation_id += n + (i == 2)
+    for writer in writers:
+        writer.close()
+    return coco_file, binary_folder
+
+
+@pytest.mark.parametrize('spool_batch', [1, 3, 4096])
+@pytest.mark.parametrize('num_images', [0, 10])
+def test_round_trip(tmp_path, monkeypatch, spool_batch, num_images):
+    monkeypatch.setattr(coco_binary, 'SPOOL_BATCH', spool_batch)
+    coco_file, binary_folder = _write(str(tmp_path), num_images)
+    with open(coco_file, 'r') as f:
+        expected = json.load(f)
+
+    binary = CocoBinary(binary_folder)
+    assert len(binary) == num_images
+    assert binary.to_coco() == expected
+
+    output_file = str(tmp_path / 'copy.json')
+    binary.write_coco(output_file)
+    with open(output_file, 'rb') as f, open(coco_file, 'rb') as g:
+        assert f.read() == g.read()
+
+
+def test_lookups(tmp_path):
+    coco_file, binary_folder = _write(str(tmp_path), 5)
+    with open(coco_file, 'r') as f:
+        expected = json.load(f)
+    binary = CocoBinary(binary_folder)
+    i = binary.index_of(103)
+    assert i == 3
+    assert binary.image(i) == expected['images'][3]
+    annotations = [obj_ann for obj_ann in expected['annotations']
+                   if obj_ann['image_id'] == 103]
+    assert binary.annotations(i) == annotations
+    assert binary.boxes(i).tolist() == [obj_ann['bbox']
+                                        for obj_ann in annotations]
+    assert len(binary.boxes(1)) == 0
+
+
+def test_abort(tmp_path):
+    folder = str(tmp_path / 'instances_val2017.cache')
+    writer = CocoBinaryWriter(folder, INFO, LICENSES, CATEGORIES)
+    writer.add_image({'license': 1, 'url': '', 'file_name': 'a.jpg',
+                      'height': 1, 'width': 1, 'date_captured': '', 'id': 1})
+    writer.abort()
+    assert os.listdir(str(tmp_path)) == []
+    with pytest.raises(ValueError):
+        CocoBinaryWriter(folder, INFO, LICENSES, CATEGORIES).add_annotation(
+            {'segmentation': [[0, 0, 1, 1]]})
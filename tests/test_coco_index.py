@@ -0,0 +1,72 @@
+import collections
+
+import numpy as np
+import pytest
+
+from utils.coco_index import CocoIndex, CocoIndexWriter, coco_index_file_name
+
+# not sorted, so the lookups can not rely on the order
+CATEGORIES = [{'id': 5, 'name': 'car'}, {'id': 2, 'name': 'person'},
+              {'id': 9, 'name': 'bike'}]
+
+
+def _annotations(num_images: int):
+    """
+    :return: [(image id, [(annotation id, category id), ...]), ...] with
+        shuffled ids
+    """
+    rng = np.random.RandomState(0)
+    image_ids = rng.permutation(num_images) * 3 + 7
+    ann_ids = iter(rng.permutation(num_images * 4) + 1)
+    res = []
+    for image_id in image_ids.tolist():
+        n = rng.randint(0, 4)
+        # bike has no boxes
+        res += [(image_id, [(int(next(ann_ids)),
+                             CATEGORIES[rng.randint(0, 2)]['id'])
+                            for _ in range(n)])]
+    return res
+
+
+@pytest.mark.parametrize('num_images', [0, 1, 25])
+def test_lookups(tmp_path, num_images):
+    output_file = coco_index_file_name(
+        str(tmp_path / 'instances_train2017.json'))
+    assert output_file.endswith('instances_train2017.lookup.npz')
+    images = _annotations(num_images)
+    writer = CocoIndexWriter(output_file, CATEGORIES)
+    for image_id, anns in images:
+        writer.add_image(image_id, [a for a, _ in anns],
+                         [c for _, c in anns])
+    writer.close()
+
+    index = CocoIndex(output_file)
+    try:
+        assert len(index) == num_images
+        position = 0
+        for i, (image_id, anns) in enumerate(images):
+            assert index.image_position(image_id) == i
+            assert index.ann_ids_of_image(image_id).tolist() == \
+                [a for a, _ in anns]
+            for ann_id, _ in anns:
+                assert index.annotation_position(ann_id) == position
+                position += 1
+
+        counts = collections.Counter(c for _, anns in images
+                                     for _, c in anns)
+        assert index.category_counts() == {c['id']: counts[c['id']]
+                                           for c in CATEGORIES}
+        for category in CATEGORIES:
+            # the images in file order, every image once
+            assert index.image_ids_of_category(category['id']).tolist() == \
+                [image_id for image_id, anns in images
+                 if category['id'] in [c for _, c in anns]]
+
+        with pytest.raises(KeyError):
+            index.image_position(-1)
+        with pytest.raises(KeyError):
+            index.annotation_position(10 ** 6)
+        with pytest.raises(KeyError):
+            index.image_ids_of_category(3)
+    finally:
+        index.close()
@@ -0,0 +1,116 @@
+import glob
+import json
+import os
+
+import pytest
+
+import convert
+from benchmarks.synthetic import generate_bdd100k, generate_inoutdoor
+from utils.coco import merge_coco_shards
+
+DATASETS = {
+    'bdd100k': (generate_bdd100k, {'train': 23, 'val': 9}, (64, 48)),
+    'inoutdoor': (generate_inoutdoor, {'train': 20, 'test': 7}, (96, 54)),
+}
+# the options which must not change the output
+VARIANTS = {
+    'workers': ['--workers', '2'],
+    'prefetch': ['--prefetch', '4'],
+    'shards': ['--coco-shards', '3'],
+    'all': ['--workers', '3', '--prefetch', '2', '--coco-shards', '2'],
+}
+
+
+@pytest.fixture(scope='module', params=sorted(DATASETS.keys()))
+def dataset(request, tmp_path_factory):
+    generate, images, image_size = DATASETS[request.param]
+    path = str(tmp_path_factory.mktemp(request.param))
+    generate(path, images, image_size=image_size, seed=1)
+    return request.param, path
+
+
+def _run(dataset, output_path: str, args=()):
+    name, path = dataset
+    os.makedirs(output_path, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(output_path)
+    try:
+        convert.main(['--dataset', name, '--dataset-path', path,
+                      '--format', 'coco', 'yolo'] + list(args))
+    finally:
+        os.chdir(cwd)
+
+
+def _outputs(output_path: str) -> dict:
+    """
+    :return: {relative path: content} of the COCO and darknet output, with
+        the shards merged, the capture dates dropped and the output path in
+        the image lists replaced
+    """
+    for index_file in glob.glob(os.path.join(
+            output_path, '**', '*.index.json'), recursive=True):
+        merge_coco_shards(index_file, '{}.json'.format(
+            index_file[:-len('.index.json')]), workers=1)
+
+    res = {}
+    for folder, _, files in os.walk(output_path):
+        for f in files:
+            path = os.path.join(folder, f)
+            key = os.path.relpath(path, output_path)
+            if f.endswith('.manifest.json') or \
+                    f.endswith('.index.json') or '-of-' in f:
+                continue
+            with open(path, 'rb') as fp:
+                data = fp.read()
+            if f.endswith('.json'):
+                obj = json.loads(data.decode('utf-8'))
+                for obj_im in obj['images']:
+                    del obj_im['date_captured']
+                res[key] = obj
+            elif f.endswith('.txt') or f.endswith('.data'):
+                res[key] = data.decode('utf-8').replace(
+                    os.path.abspath(output_path), '')
+            else:
+                res[key] = data
+    return res
+
+
+@pytest.fixture(scope='module')
+def reference(dataset, tmp_path_factory):
+    output_path = str(tmp_path_factory.mktemp('reference'))
+    _run(dataset, output_path)
+    return _outputs(output_path)
+
+
+@pytest.mark.parametrize('variant', sorted(VARIANTS.keys()))
+def test_same_output(dataset, reference, variant, tmp_path):
+    _run(dataset, str(tmp_path), VARIANTS[variant])
+    outputs = _outputs(str(tmp_path))
+    assert sorted(outputs.keys()) == sorted(reference.keys())
+    for key in reference:
+        assert outputs[key] == reference[key], key
+
+
+def test_incremental(dataset, reference, tmp_path):
+    _run(dataset, str(tmp_path), ['--incremental'])
+    _run(dataset, str(tmp_path), ['--incremental', '--workers', '2'])
+    assert _outputs(str(tmp_path)) == reference
+
+
+def test_subset_ids(dataset, reference, tmp_path):
+    # the subset keeps the ids of the full run
+    _run(dataset, str(tmp_path), ['--format', 'summary',
+                                  '--annotations-only'])
+    _run(dataset, str(tmp_path), ['--subset-size', '4',
+                                  '--annotations-only'])
+    outputs = _outputs(str(tmp_path))
+    annotation_files = [key for key in reference
+                        if key.endswith('.json') and 'instances_' in key]
+    assert annotation_files
+    for key in annotation_files:
+        ids = {obj_im['file_name']: obj_im['id']
+               for obj_im in reference[key]['images']}
+        images = outputs[key]['images']
+        assert 0 < len(images) <= 4
+        for obj_im in images:
+            assert obj_im['id'] == ids[obj_im['file_name']]
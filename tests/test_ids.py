@@ -0,0 +1,58 @@
+import pytest
+
+from utils.ids import HASH_ANNOTATION_BITS, IdAllocator, stable_image_id
+from utils.pairing import pair_by_stem
+
+
+def test_pairing_counts_all_stems():
+    images = {'a': 'a.jpg', 'b': 'b.jpg', 'c': 'c.jpg'}
+    labels = {'a': 'a.json', 'b': 'b.json', 'x': 'x.json'}
+    pairing = pair_by_stem(images, labels)
+    assert pairing.pairs == [(0, 'a.jpg', 'a.json'), (1, 'b.jpg', 'b.json')]
+    # the trailing image without a label is part of the listing
+    assert pairing.num_stems == 3
+    assert pairing.orphan_images == ['c.jpg']
+    assert pairing.orphan_labels == ['x.json']
+
+
+def test_sequential_ids_do_not_depend_on_labels():
+    ids = []
+    for labels in [{'a': 'a.json', 'b': 'b.json', 'c': 'c.json'},
+                   {'a': 'a.json', 'b': 'b.json'}]:
+        pairing = pair_by_stem({'a': 'a.jpg', 'b': 'b.jpg', 'c': 'c.jpg'},
+                               labels)
+        allocator = IdAllocator('sequential')
+        allocator.begin_fold('train', pairing.num_stems)
+        allocator.begin_fold('val', 2)
+        ids += [[allocator.image_id(0, 'd.jpg'),
+                 allocator.image_id(1, 'e.jpg')]]
+    assert ids[0] == ids[1] == [3, 4]
+
+
+def test_sequential_annotation_ids():
+    allocator = IdAllocator('sequential')
+    allocator.begin_fold('train', 2)
+    assert allocator.annotation_ids(0, 3) == 0
+    assert allocator.annotation_ids(1, 2) == 3
+    allocator.begin_fold('val', 1)
+    assert allocator.annotation_ids(2, 1) == 5
+
+
+def test_position_outside_of_listing():
+    allocator = IdAllocator('sequential')
+    allocator.begin_fold('train', 2)
+    with pytest.raises(ValueError):
+        allocator.image_id(2, 'c.jpg')
+
+
+def test_hash_ids():
+    allocator = IdAllocator('hash')
+    allocator.begin_fold('train', 10)
+    image_id = allocator.image_id(5, 'a.jpg')
+    # independent of the position and the extension
+    assert image_id == stable_image_id('train', 'a.png')
+    assert allocator.annotation_ids(image_id, 3) == \
+        image_id << HASH_ANNOTATION_BITS
+    assert stable_image_id('val', 'a.jpg') != image_id
+    with pytest.raises(ValueError):
+        allocator.image_id(6, 'a.jpg')
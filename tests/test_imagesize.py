@@ -0,0 +1,75 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from utils.imagesize import ImageSizeCache, get_image_format, get_image_size
+
+
+def _encode(size, mode: str = 'RGB', **options) -> bytes:
+    f = io.BytesIO()
+    Image.new(mode, size, color=0).save(f, **options)
+    return f.getvalue()
+
+
+@pytest.mark.parametrize('fmt,options', [
+    ('JPEG', {}),
+    ('JPEG', {'progressive': True}),
+    ('JPEG', {'exif': b'Exif\x00\x00' + b'\x00' * 64}),
+    ('PNG', {}),
+])
+@pytest.mark.parametrize('size', [(1, 1), (640, 480), (37, 1001)])
+def test_header_size(fmt, options, size, tmp_path):
+    data = _encode(size, format=fmt, **options)
+    path = str(tmp_path / 'image')
+    with open(path, 'wb') as f:
+        f.write(data)
+    assert get_image_size(path) == size
+    assert get_image_size('missing', data=data) == size
+
+
+def test_other_format(tmp_path):
+    # formats without a header parser are handed to PIL
+    path = str(tmp_path / 'image.bmp')
+    Image.new('RGB', (12, 34)).save(path)
+    assert get_image_size(path) == (12, 34)
+    assert get_image_format(path) == (None, None)
+
+
+@pytest.mark.parametrize('mode,components', [('L', 1), ('RGB', 3),
+                                             ('CMYK', 4)])
+def test_format(mode, components):
+    data = _encode((8, 8), mode, format='JPEG')
+    assert get_image_format('missing', data=data) == ('JPEG', components)
+    data = _encode((8, 8), mode if mode != 'CMYK' else 'RGBA',
+                   format='PNG')
+    assert get_image_format('missing', data=data) == ('PNG', None)
+
+
+def test_cache(tmp_path):
+    path = str(tmp_path / 'image.png')
+    Image.new('RGB', (20, 10)).save(path)
+    cache_file = str(tmp_path / 'sizes.json')
+    cache = ImageSizeCache(cache_file)
+    assert cache.get(path) == (20, 10)
+    cache.save()
+
+    cache = ImageSizeCache(cache_file)
+    assert cache.lookup(path) == (20, 10)
+    # a changed image is read again
+    Image.new('RGB', (30, 15)).save(path)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert cache.lookup(path) is None
+    assert cache.get(path) == (30, 15)
+
+
+def test_no_cache_file(tmp_path):
+    path = str(tmp_path / 'image.png')
+    Image.new('RGB', (5, 6)).save(path)
+    cache = ImageSizeCache()
+    assert cache.get(path) == (5, 6)
+    assert cache.entries == {}
+    cache.save()
+    assert os.listdir(str(tmp_path)) == ['image.png']
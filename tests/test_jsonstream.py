@@ -0,0 +1,67 @@
+import io
+import json
+
+import pytest
+
+from utils.jsonstream import JsonStream
+
+DOCUMENT = {
+    'name': 'b1c66a42-6f7d68ca',
+    'frames': [
+        {'timestamp': 10000, 'objects': [
+            {'category': 'car', 'box2d': {'x1': 45.24, 'y1': 254.53,
+                                          'x2': 357.8, 'y2': 487.9}},
+            {'category': 'traffic sign', 'box2d': {'x1': 1e-3, 'y1': -0.5,
+                                                   'x2': 12, 'y2': 1234567}},
+        ]},
+        {'timestamp': 10001, 'objects': []},
+        12345678901234567890,
+        -0.25e+2,
+        'a "quoted" \\ string é',
+        [], {}, True, False, None,
+    ],
+    'attributes': {'weather': 'clear', 'scene': 'city street'},
+}
+
+
+def _read(stream: JsonStream) -> dict:
+    res = {}
+    for key in stream.items():
+        if key == 'frames':
+            res[key] = list(stream.array())
+        else:
+            res[key] = stream.value()
+    return res
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 20])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_chunk_boundaries(chunk_size, indent):
+    # every split of the values between chunks decodes the same
+    text = json.dumps(DOCUMENT, indent=indent)
+    assert _read(JsonStream(io.StringIO(text), chunk_size)) == DOCUMENT
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 1 << 20])
+def test_numbers(chunk_size):
+    # a number at the end of a chunk might continue in the next one
+    numbers = [1, 12, 123456, -7, 0.5, 1e10, 123456789012]
+    text = '[{}]'.format(','.join(str(n) for n in numbers))
+    stream = JsonStream(io.StringIO(text), chunk_size)
+    assert list(stream.array()) == numbers
+    assert stream.peek() == ''
+    assert JsonStream(io.StringIO(' 1234 '), chunk_size).value() == 1234
+
+
+def test_empty():
+    assert list(JsonStream(io.StringIO(' [ ] ')).array()) == []
+    assert list(JsonStream(io.StringIO('{}')).items()) == []
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        list(JsonStream(io.StringIO('{"a": 1}')).array())
+    with pytest.raises(ValueError):
+        list(JsonStream(io.StringIO('[1, 2'), 2).array())
+    with pytest.raises(ValueError):
+        JsonStream(io.StringIO('[1, @]')).value()
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from utils.imagesize import get_image_size
+from utils.materialize import MATERIALIZE_MODES, TranscodeOptions, \
+    materialize_image, materialize_images
+
+
+def _noise_image(path: str, size=(64, 48)):
+    from PIL import Image
+    pil_im = Image.frombytes('RGB', size, bytes(
+        (i * 7919) % 251 for i in range(size[0] * size[1] * 3)))
+    pil_im.save(path)
+
+
+@pytest.fixture
+def jpeg(tmp_path):
+    path = str(tmp_path / 'src.jpg')
+    _noise_image(path)
+    return path
+
+
+def _read(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('mode', MATERIALIZE_MODES)
+def test_modes(jpeg, tmp_path, mode):
+    dst = str(tmp_path / 'dst.jpg')
+    materialize_image(jpeg, dst, mode)
+    if mode == 'none':
+        assert not os.path.lexists(dst)
+        return
+    assert _read(dst) == _read(jpeg)
+    assert os.path.islink(dst) == (mode == 'symlink')
+
+
+def test_transcode_only_if_needed(jpeg, tmp_path):
+    dst = str(tmp_path / 'dst.png')
+    materialize_image(jpeg, dst, 'transcode-only-if-needed')
+    assert _read(dst).startswith(b'\x89PNG')
+    assert get_image_size(dst) == (64, 48)
+
+
+def test_quality_without_size(jpeg, tmp_path):
+    outputs = []
+    for quality in [10, 95]:
+        dst = str(tmp_path / 'q{}.jpg'.format(quality))
+        materialize_image(jpeg, dst, 'copy',
+                          options=TranscodeOptions(quality=quality))
+        outputs += [_read(dst)]
+    assert outputs[0] != outputs[1]
+    assert len(outputs[0]) < len(outputs[1])
+
+
+def test_resize(jpeg, tmp_path):
+    dst = str(tmp_path / 'dst.jpg')
+    materialize_image(jpeg, dst, 'copy',
+                      options=TranscodeOptions(size=(32, 32)))
+    assert get_image_size(dst) == (32, 24)
+
+
+def test_images_read_once(jpeg, tmp_path):
+    data = _read(jpeg)
+    targets = [(str(tmp_path / 'a.jpg'), 'copy'),
+               (str(tmp_path / 'b.png'), 'transcode-only-if-needed'),
+               (str(tmp_path / 'c.png'), 'transcode-only-if-needed')]
+    copies = materialize_images(jpeg, targets, data)
+    # the plain copy is left to the caller
+    assert copies == [str(tmp_path / 'a.jpg')]
+    assert _read(str(tmp_path / 'b.png')) == _read(str(tmp_path / 'c.png'))
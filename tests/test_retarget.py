@@ -0,0 +1,115 @@
+import glob
+import json
+import os
+import tarfile
+
+import pytest
+
+import convert
+from benchmarks.synthetic import generate_bdd100k
+from utils.retarget import _DarknetLabels, coco_to_yolo, yolo_to_coco
+from utils.yolo import YoloLabelWriter
+
+
+@pytest.fixture(scope='module')
+def coco_path(tmp_path_factory):
+    source = str(tmp_path_factory.mktemp('source'))
+    generate_bdd100k(source, {'train': 6, 'val': 3}, image_size=(64, 48),
+                     seed=1)
+    output_path = str(tmp_path_factory.mktemp('coco'))
+    cwd = os.getcwd()
+    os.chdir(output_path)
+    try:
+        convert.main(['--dataset', 'bdd100k', '--dataset-path', source,
+                      '--format', 'coco'])
+    finally:
+        os.chdir(cwd)
+    return os.path.join(output_path, 'deepdrive')
+
+
+def _coco_files(path: str):
+    return sorted(glob.glob(os.path.join(path, 'annotations',
+                                         'instances_*[0-9].json')))
+
+
+def _labels(path: str) -> dict:
+    """
+    :return: {file name: content} of the label files or archives under path
+    """
+    res = {}
+    for f in glob.glob(os.path.join(path, 'labels', '*', '*.txt')):
+        with open(f, 'r') as fp:
+            res[os.path.basename(f)] = fp.read()
+    for f in glob.glob(os.path.join(path, 'labels', '*.tar')):
+        with tarfile.open(f, 'r') as archive:
+            for member in archive:
+                res[member.name] = \
+                    archive.extractfile(member).read().decode('utf-8')
+    return res
+
+
+@pytest.mark.parametrize('archive', [False, True])
+def test_round_trip(coco_path, tmp_path, archive):
+    yolo_path = str(tmp_path / 'yolo')
+    coco_to_yolo(_coco_files(coco_path), yolo_path, 'bdd',
+                 label_archive=archive)
+    assert os.path.isfile(os.path.join(yolo_path, 'data', 'bdd.data'))
+    labels = _labels(yolo_path)
+    assert len(labels) == 9
+    if archive:
+        assert not glob.glob(os.path.join(yolo_path, 'labels', '*', '*'))
+
+    output_path = str(tmp_path / 'coco')
+    yolo_to_coco(os.path.join(yolo_path, 'data', 'bdd.names'),
+                 sorted(glob.glob(os.path.join(yolo_path, 'data',
+                                               'bdd_*.txt'))),
+                 output_path, references=_coco_files(coco_path))
+
+    for coco_file in _coco_files(coco_path):
+        with open(coco_file, 'r') as f:
+            expected = json.load(f)
+        with open(os.path.join(output_path, 'annotations',
+                               os.path.basename(coco_file)), 'r') as f:
+            obj = json.load(f)
+        assert obj['categories'] == expected['categories']
+        # the reference image entries are kept
+        assert obj['images'] == expected['images']
+        assert len(obj['annotations']) == len(expected['annotations'])
+        for a, b in zip(obj['annotations'], expected['annotations']):
+            assert a['category_id'] == b['category_id']
+            assert a['bbox'] == pytest.approx(b['bbox'], abs=1e-3)
+
+
+def test_archive_order(tmp_path):
+    # members out of image order and missing members are still found
+    images_folder = tmp_path / 'images' / 'train'
+    images_folder.mkdir(parents=True)
+    (tmp_path / 'labels').mkdir()
+    writer = YoloLabelWriter(str(tmp_path / 'labels' / 'train'),
+                             archive=True)
+    for i in [2, 0, 1]:
+        writer.write('{}.txt'.format(i), '0 0.5 0.5 {} 0.1\n'.format(i))
+    writer.close()
+
+    labels = _DarknetLabels(str(images_folder))
+    try:
+        assert labels.read(str(images_folder / '0.jpg')) == \
+            '0 0.5 0.5 0 0.1\n'
+        assert labels.read(str(images_folder / '3.jpg')) == ''
+        assert labels.read(str(images_folder / '1.jpg')) == \
+            '0 0.5 0.5 1 0.1\n'
+        assert labels.read(str(images_folder / '2.jpg')) == \
+            '0 0.5 0.5 2 0.1\n'
+    finally:
+        labels.close()
+
+
+def test_folder(tmp_path):
+    images_folder = tmp_path / 'images' / 'val'
+    images_folder.mkdir(parents=True)
+    (tmp_path / 'labels' / 'val').mkdir(parents=True)
+    (tmp_path / 'labels' / 'val' / 'a.txt').write_text('1 0.5 0.5 0.2 0.2\n')
+    labels = _DarknetLabels(str(images_folder))
+    assert labels.read(str(images_folder / 'a.png')) == '1 0.5 0.5 0.2 0.2\n'
+    assert labels.read(str(images_folder / 'b.png')) == ''
+    labels.close()
@@ -0,0 +1,117 @@
+import collections
+
+import numpy as np
+import pytest
+
+from utils.subset import Subset, _allocate, label_summary_file_name, \
+    load_label_summary, save_label_summary, stratify_by_category
+
+
+def _summary(folder: str, n: int = 100):
+    """
+    Writes a summary of n images in 4 sequences of different sizes, the
+    images of the last one have a category of their own.
+    """
+    keys = ['{:04d}.png'.format(i) for i in range(n)]
+    groups = ['seq{}'.format(min(i * 10 // n, 3)) for i in range(n)]
+    counts = np.zeros((n, 3), dtype=np.int32)
+    counts[:, 0] = np.arange(n) % 3
+    counts[np.array(groups) == 'seq3', 2] = 1
+    save_label_summary(label_summary_file_name(folder, 'train', 2017), keys,
+                       counts, groups)
+    return keys, counts, groups
+
+
+def test_summary(tmp_path):
+    keys, counts, groups = _summary(str(tmp_path))
+    res = load_label_summary(label_summary_file_name(str(tmp_path),
+                                                     'train', 2017))
+    assert res[0] == keys
+    assert res[1].tolist() == counts.tolist()
+    assert [g.decode('utf-8') for g in res[2]] == groups
+
+
+def test_size_and_fraction(tmp_path):
+    keys, _, _ = _summary(str(tmp_path))
+    selected = Subset(str(tmp_path), size=10).select_keys('train', 2017)
+    assert len(selected) == 10
+    assert selected == sorted(selected)
+    assert set(selected) <= set(keys)
+    assert len(Subset(str(tmp_path), fraction=0.25).select_keys(
+        'train', 2017)) == 25
+    assert Subset(str(tmp_path), size=1000).select_keys('train', 2017) == \
+        keys
+
+
+def test_seed(tmp_path):
+    _summary(str(tmp_path))
+    a = Subset(str(tmp_path), size=10, seed=1).select_keys('train', 2017)
+    assert Subset(str(tmp_path), size=10, seed=1).select_keys(
+        'train', 2017) == a
+    assert Subset(str(tmp_path), size=10, seed=2).select_keys(
+        'train', 2017) != a
+
+
+def test_stratify_by_sequence(tmp_path):
+    keys, _, groups = _summary(str(tmp_path))
+    group_of = dict(zip(keys, groups))
+    selected = Subset(str(tmp_path), size=20,
+                      stratify='sequence').select_keys('train', 2017)
+    assert len(selected) == 20
+    # seq0 to seq2 hold 10 images each and seq3 70
+    assert collections.Counter(group_of[k] for k in selected) == \
+        {'seq0': 2, 'seq1': 2, 'seq2': 2, 'seq3': 14}
+
+
+def test_stratify_by_category(tmp_path):
+    # category 2 is the rarest, then 1 and 0, the last 4 images have no
+    # boxes
+    counts = np.zeros((20, 3), dtype=np.int32)
+    counts[:16, 0] = 1
+    counts[:4, 2] = 2
+    counts[:8, 1] = 1
+    strata = stratify_by_category(counts)
+    assert strata.tolist() == [2] * 4 + [1] * 4 + [0] * 8 + [3] * 4
+
+    keys = ['{}.png'.format(i) for i in range(20)]
+    save_label_summary(label_summary_file_name(str(tmp_path), 'train', 2017),
+                       keys, counts, [None] * 20)
+    selected = Subset(str(tmp_path), size=10,
+                      stratify='category').select_keys('train', 2017)
+    stratum_of = dict(zip(keys, strata.tolist()))
+    assert collections.Counter(stratum_of[k] for k in selected) == \
+        {0: 4, 1: 2, 2: 2, 3: 2}
+
+
+def test_allocate():
+    assert _allocate(np.array([10, 10, 10]), 3).tolist() == [1, 1, 1]
+    assert _allocate(np.array([1, 2, 7]), 5).tolist() == [1, 1, 3]
+    assert _allocate(np.array([5, 5]), 10).tolist() == [5, 5]
+    assert _allocate(np.array([3, 1]), 0).tolist() == [0, 0]
+
+
+def test_errors(tmp_path):
+    with pytest.raises(ValueError):
+        Subset(str(tmp_path))
+    with pytest.raises(ValueError):
+        Subset(str(tmp_path), size=1, fraction=0.5)
+    with pytest.raises(ValueError):
+        Subset(str(tmp_path), fraction=1.5)
+    with pytest.raises(ValueError):
+        Subset(str(tmp_path), size=1, stratify='weather')
+    with pytest.raises(ValueError, match='--format summary'):
+        Subset(str(tmp_path), size=1).select_keys('train', 2017)
+    save_label_summary(label_summary_file_name(str(tmp_path), 'val', 2017),
+                       ['a', 'b'], np.ones((2, 1)), [None, None])
+    with pytest.raises(ValueError, match='sequences'):
+        Subset(str(tmp_path), size=1, stratify='sequence').select_keys(
+            'val', 2017)
+
+
+def test_select(tmp_path):
+    _summary(str(tmp_path), n=10)
+    pairs = [(i, '/data/{:04d}.png'.format(i), '/labels/{}.json'.format(i))
+             for i in range(12)]
+    res = Subset(str(tmp_path), size=3).select('train', 2017, pairs)
+    assert len(res) == 3
+    assert all(pair in pairs[:10] for pair in res)
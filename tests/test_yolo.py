@@ -0,0 +1,62 @@
+import os
+import tarfile
+
+import numpy as np
+
+from utils.boxes import BoxArray
+from utils.yolo import YoloLabelWriter, format_yolo_labels, \
+    parse_yolo_lines
+
+LABELS = {
+    'a.txt': '0 0.5 0.5 0.25 0.25\n',
+    'b.txt': '',
+    'c.txt': '2 0.1 0.2 0.3 0.4\n1 0.5 0.5 1.0 1.0\n',
+}
+
+
+def _write(labels_folder: str, archive: bool, workers: int = 1):
+    writer = YoloLabelWriter(labels_folder, archive=archive,
+                             workers=workers)
+    for file_name, content in sorted(LABELS.items()):
+        writer.write(file_name, content)
+    writer.close()
+
+
+def test_files(tmp_path):
+    labels_folder = str(tmp_path / 'labels')
+    os.makedirs(labels_folder)
+    _write(labels_folder, archive=False, workers=2)
+    for file_name, content in LABELS.items():
+        with open(os.path.join(labels_folder, file_name), 'r') as f:
+            assert f.read() == content
+
+
+def test_archive(tmp_path):
+    _write(str(tmp_path / 'labels'), archive=True)
+    with tarfile.open(str(tmp_path / 'labels.tar'), 'r') as archive:
+        contents = {member.name: archive.extractfile(member).read().decode(
+            'utf-8') for member in archive}
+    assert contents == LABELS
+
+
+def test_archive_is_reproducible(tmp_path):
+    _write(str(tmp_path / 'first'), archive=True)
+    _write(str(tmp_path / 'second'), archive=True)
+    with open(str(tmp_path / 'first.tar'), 'rb') as f:
+        first = f.read()
+    with open(str(tmp_path / 'second.tar'), 'rb') as f:
+        assert f.read() == first
+    # also across runs at different times
+    with tarfile.open(str(tmp_path / 'first.tar'), 'r') as archive:
+        assert {member.mtime for member in archive} == {0}
+
+
+def test_format_parse():
+    boxes = BoxArray.from_lists(xmin=[10, 0], xmax=[30, 100],
+                                ymin=[20, 50], ymax=[60, 100], label=[1, 3])
+    content = format_yolo_labels(boxes, BoxArray.Normalizer(100, 100))
+    assert content == '0 0.2 0.4 0.2 0.4\n2 0.5 0.75 1.0 0.5\n'
+    classes, xcycwh = parse_yolo_lines(content)
+    assert classes.tolist() == [0, 2]
+    np.testing.assert_allclose(xcycwh, [[0.2, 0.4, 0.2, 0.4],
+                                        [0.5, 0.75, 1.0, 0.5]])
@@ -0,0 +1,95 @@
+import json
+import os
+
+from typing import Optional
+
+from utils.metrics import stage
+from utils.read import load_yaml
+
+
+class AnnotationCache(object):
+    """
+    Parsed annotation files stored as json lines, one line per file with its
+    name, size, mtime and the parsed content. The whole cache is read at
+    once, a cached entry is only used while size and mtime of the annotation
+    file are unchanged. Files which are missing or outdated are parsed and
+    added, save() writes the cache back if anything changed.
+
+    The files are named relative to root if given, so the cache stays valid
+    when the dataset is moved or mounted elsewhere.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None,
+                 root: Optional[str] = None):
+        self.cache_file = cache_file
+        self.root = root
+        self.entries = {}
+        self.changed = False
+        if cache_file is not None and os.path.exists(cache_file):
+            with open(cache_file, 'r') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[entry['file']] = entry
+
+    @staticmethod
+    def _parse(path: str, data: Optional[bytes] = None):
+        if data is None:
+            with stage('read_label'), open(path, 'rb') as f:
+                data = f.read()
+        with stage('parse'):
+            return load_yaml(path, data)
+
+    def load(self, path: str, data: Optional[bytes] = None):
+        """
+        :param data: content of the file at path if it was read already
+        """
+        if self.cache_file is None:
+            return self._parse(path, data)
+
+        st = os.stat(path)
+        name = os.path.relpath(path, self.root) if self.root is not None \
+            else path
+        entry = self.entries.get(name)
+        if entry is not None and entry['size'] == st.st_size and \
+                entry['mtime'] == st.st_mtime_ns:
+            return entry['annotation']
+
+        obj = self._parse(path, data)
+        self.entries[name] = {
+            'file': name,
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'annotation': obj
+        }
+        self.changed = True
+        return obj
+
+    def compile(self, label_path: str, extension: str = '.yml'):
+        """
+        Parses the annotation files in label_path which are not cached yet.
+        """
+        for f in sorted(os.listdir(label_path)):
+            if f.endswith(extension):
+                self.load(os.path.join(label_path, f))
+
+    def save(self):
+        if not self.changed:
+            return
+        tmp_file = '{}.tmp'.format(self.cache_file)
+        with open(tmp_file, 'w') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, default=str))
+                f.write('\n')
+        os.replace(tmp_file, self.cache_file)
+        self.changed = False
+
+
+def compile_annotations(label_path: str, cache_file: str,
+                        extension: str = '.yml') -> AnnotationCache:
+    """
+    Parses all annotation files in label_path into the cache_file.
+    """
+    cache = AnnotationCache(cache_file, root=label_path)
+    cache.compile(label_path, extension)
+    cache.save()
+    return cache
@@ -1,4 +1,5 @@
-
+import numpy as np
+from typing import Dict, Tuple
 
 
 class Boxes(object):
@@ -76,3 +77,197 @@ class Boxes(object):
         w, h = self.dimension
         return w * h
 
+
+BOX_DTYPE = np.dtype([
+    ('xmin', np.float64), ('ymin', np.float64),
+    ('xmax', np.float64), ('ymax', np.float64),
+    ('label', np.int64)
+])
+
+
+class BoxArray(object):
+    """
+    Columnar counterpart of Boxes, which stores the boxes of an image (or
+    a whole fold) in a structured numpy array. All conversions work on the
+    full array and return an (n, 4) float array, the labels are integers
+    (the category ids).
+    """
+
+    Normalizer = Boxes.Normalizer
+
+    def __init__(self, boxes: np.ndarray):
+        assert(boxes.dtype == BOX_DTYPE)
+        self.boxes = boxes
+
+    @classmethod
+    def from_lists(cls, xmin, xmax, ymin, ymax, label):
+        boxes = np.empty(len(label), dtype=BOX_DTYPE)
+        boxes['xmin'] = xmin
+        boxes['xmax'] = xmax
+        boxes['ymin'] = ymin
+        boxes['ymax'] = ymax
+        boxes['label'] = label
+        return cls(boxes)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=BOX_DTYPE))
+
+    @classmethod
+    def concatenate(cls, box_arrays):
+        return cls(np.concatenate([b.boxes for b in box_arrays]))
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __getitem__(self, item):
+        return BoxArray(np.atleast_1d(self.boxes[item]))
+
+    @property
+    def xmin(self) -> np.ndarray:
+        return self.boxes['xmin']
+
+    @property
+    def ymin(self) -> np.ndarray:
+        return self.boxes['ymin']
+
+    @property
+    def xmax(self) -> np.ndarray:
+        return self.boxes['xmax']
+
+    @property
+    def ymax(self) -> np.ndarray:
+        return self.boxes['ymax']
+
+    @property
+    def label(self) -> np.ndarray:
+        return self.boxes['label']
+
+    def to_xyxy(self, normalization=None) -> np.ndarray:
+        assert(normalization is None or
+               isinstance(normalization, Boxes.Normalizer))
+        res = np.stack([self.xmin, self.ymin, self.xmax, self.ymax], axis=1)
+        if normalization is None:
+            return res
+        return res / [normalization.width, normalization.height,
+                      normalization.width, normalization.height]
+
+    def to_xywh(self, normalization=None) -> np.ndarray:
+        assert(normalization is None or
+               isinstance(normalization, Boxes.Normalizer))
+        w, h = self.dimension
+        res = np.stack([self.xmin, self.ymin, w, h], axis=1)
+        if normalization is None:
+            return res
+        return res / [normalization.width, normalization.height,
+                      normalization.width, normalization.height]
+
+    def to_xcycwh(self, normalization=None) -> np.ndarray:
+        assert(normalization is None or
+               isinstance(normalization, Boxes.Normalizer))
+        xmin, ymin = self.xmin, self.ymin
+        w, h = self.dimension
+        if normalization is not None:
+            xmin, w = xmin / normalization.width, w / normalization.width
+            ymin, h = ymin / normalization.height, h / normalization.height
+        return np.stack([xmin + w / 2, ymin + h / 2, w, h], axis=1)
+
+    def normalize(self, normalization) -> 'BoxArray':
+        """
+        :return: the boxes divided by the width and height of normalization
+        """
+        return self._apply(lambda x: x / normalization.width,
+                           lambda y: y / normalization.height)
+
+    def rescale(self, width, height) -> 'BoxArray':
+        """
+        :return: the (normalized) boxes multiplied by width and height
+        """
+        return self._apply(lambda x: x * width, lambda y: y * height)
+
+    def _apply(self, fx, fy) -> 'BoxArray':
+        boxes = self.boxes.copy()
+        for key in ['xmin', 'xmax']:
+            boxes[key] = fx(boxes[key])
+        for key in ['ymin', 'ymax']:
+            boxes[key] = fy(boxes[key])
+        return BoxArray(boxes)
+
+    @property
+    def dimension(self):
+        """
+        :return: (width, height) arrays
+        """
+        return (self.xmax - self.xmin, self.ymax - self.ymin)
+
+    @property
+    def area(self) -> np.ndarray:
+        w, h = self.dimension
+        return w * h
+
+
+class BoxValidator(object):
+    """
+    Repairs the boxes of an image before they are exported, on the whole
+    array at once. Swapped corners are exchanged, with clip the boxes are
+    clipped to the image and boxes which are not finite, have no extent
+    (degenerate) or are smaller than min_area or min_size pixels in width or
+    height are dropped. The fixes are returned with the boxes, counted per
+    reason as box_swapped, box_clipped and
+    box_dropped_{invalid,degenerate,small}.
+
+    The boxes are only copied if one of them needs a fix.
+    """
+
+    def __init__(self, clip: bool = True, min_area: float = 0.,
+                 min_size: float = 0.):
+        self.clip = clip
+        self.min_area = min_area
+        self.min_size = min_size
+
+    def __call__(self, boxes: BoxArray, width: int,
+                 height: int) -> Tuple[BoxArray, Dict[str, int]]:
+        """
+        :return: (the repaired boxes, {reason: number of boxes}) with the
+            reasons which occurred
+        """
+        fixes = {}
+        if len(boxes) == 0:
+            return boxes, fixes
+        res = boxes.boxes
+
+        swapped = (res['xmin'] > res['xmax']) | (res['ymin'] > res['ymax'])
+        if swapped.any():
+            res = res.copy()
+            for lo, hi in [('xmin', 'xmax'), ('ymin', 'ymax')]:
+                res[lo], res[hi] = np.minimum(res[lo], res[hi]), \
+                    np.maximum(res[lo], res[hi])
+            fixes['box_swapped'] = int(swapped.sum())
+
+        if self.clip:
+            clipped = (res['xmin'] < 0) | (res['ymin'] < 0) | \
+                (res['xmax'] > width) | (res['ymax'] > height)
+            if clipped.any():
+                if res is boxes.boxes:
+                    res = res.copy()
+                for key, limit in [('xmin', width), ('xmax', width),
+                                   ('ymin', height), ('ymax', height)]:
+                    np.clip(res[key], 0, limit, out=res[key])
+                fixes['box_clipped'] = int(clipped.sum())
+
+        w = res['xmax'] - res['xmin']
+        h = res['ymax'] - res['ymin']
+        with np.errstate(invalid='ignore'):
+            valid = np.isfinite(w) & np.isfinite(h)
+            keep = valid & (w > 0) & (h > 0)
+            small = keep & ((w * h < self.min_area) | (w < self.min_size) |
+                            (h < self.min_size))
+        if keep.all() and not small.any():
+            return boxes if res is boxes.boxes else BoxArray(res), fixes
+
+        for reason, dropped in [('invalid', ~valid),
+                                ('degenerate', valid & ~keep),
+                                ('small', small)]:
+            if dropped.any():
+                fixes['box_dropped_{}'.format(reason)] = int(dropped.sum())
+        return BoxArray(res[keep & ~small]), fixes
@@ -0,0 +1,92 @@
+import itertools
+
+import numpy as np
+from typing import Dict, List, Optional
+
+from utils.metrics import count
+
+UNKNOWN_POLICIES = ['error', 'skip', 'collect']
+
+
+class UnknownCategoryError(ValueError):
+    pass
+
+
+class CategoryRegistry(object):
+    """
+    Maps the category names of a dataset to the exported categories. The
+    COCO ids are the 1-based positions in labels, the darknet class is the
+    COCO id - 1.
+
+    aliases maps a source name to an exported name, which merges classes:
+    {'bike': 'two-wheeler', 'motor': 'two-wheeler'} replaces both by a
+    two-wheeler category at the position of bike. A source name which is
+    aliased is no category of its own anymore, unless it is the target of
+    an alias as well.
+
+    Names which are neither a label nor aliased are handled by unknown:
+    error raises an UnknownCategoryError, skip drops the box and collect
+    drops it as well but counts it per name in the metrics.
+    """
+
+    def __init__(self, source_labels: List[str],
+                 aliases: Optional[Dict[str, str]] = None,
+                 unknown: str = 'collect'):
+        if unknown not in UNKNOWN_POLICIES:
+            raise ValueError('Unknown policy for unknown labels: {}'.format(
+                unknown))
+        aliases = dict(aliases or {})
+        self.source_labels = list(source_labels)
+        self.aliases = aliases
+        self.unknown = unknown
+
+        self.labels = []
+        for name in self.source_labels:
+            name = aliases.get(name, name)
+            if name not in self.labels:
+                self.labels += [name]
+        for name in aliases.values():
+            if name not in self.labels:
+                self.labels += [name]
+
+        self.ids = {name: i + 1 for i, name in enumerate(self.labels)}
+        for source, target in aliases.items():
+            self.ids[source] = self.ids[target]
+
+    @classmethod
+    def from_args(cls, source_labels: List[str], aliases: List[str],
+                  unknown: str = 'collect') -> 'CategoryRegistry':
+        """
+        :param aliases: ['source=target', ...]
+        """
+        mapping = {}
+        for alias in aliases or []:
+            source, sep, target = alias.partition('=')
+            if not sep or not source or not target:
+                raise ValueError('Invalid alias {!r}, expected '
+                                 'source=target'.format(alias))
+            mapping[source] = target
+        return cls(source_labels, mapping, unknown)
+
+    def coco_categories(self) -> List[dict]:
+        return [{'id': i + 1, 'name': name}
+                for i, name in enumerate(self.labels)]
+
+    def map(self, names: List[str]) -> np.ndarray:
+        """
+        Looks up the COCO ids of the category names of an image at once.
+
+        :return: the ids, 0 for the names which are skipped
+        """
+        ids = np.fromiter(map(self.ids.get, names, itertools.repeat(0)),
+                          dtype=np.int64, count=len(names))
+        if len(ids) and not ids.all():
+            unknown = [name for name, i in zip(names, ids) if i == 0]
+            if self.unknown == 'error':
+                raise UnknownCategoryError(
+                    'Unknown categories: {}'.format(sorted(set(unknown))))
+            count('unknown_labels', len(unknown))
+            if self.unknown == 'collect':
+                for name in unknown:
+                    count('unknown_label:{}'.format(name))
+        return ids
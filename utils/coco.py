@@ -0,0 +1,341 @@
+import json
+import mmap
+import os
+import shutil
+
+import numpy as np
+from typing import List, Tuple
+
+from utils.boxes import BoxArray
+from utils.parallel import ordered_map
+
+# the parts CocoWriter writes around the images and the annotations
+COCO_IMAGES_END = '], "type": "instances", "annotations": ['
+COCO_SEPARATOR = ', '
+# an annotation of CocoWriter.add_annotations as json.dumps writes it, which
+# uses repr for finite floats
+COCO_ANNOTATION = '{{"segmentation": [], "iscrowd": 0, "image_id": {}, ' \
+                  '"id": {}, "area": {!r}, "category_id": {}, ' \
+                  '"bbox": [{!r}, {!r}, {!r}, {!r}]}}'
+
+
+def _coco_header(info: dict, licenses: List[dict]) -> str:
+    return '{{"info": {}, "licenses": {}, "images": ['.format(
+        json.dumps(info), json.dumps(licenses))
+
+
+def _coco_footer(categories: List[dict]) -> str:
+    return '], "categories": {}}}'.format(json.dumps(categories))
+
+
+class CocoWriter(object):
+    """
+    Writes a COCO annotation file incrementally. Images are appended to the
+    output as they are added, annotations are spooled to a temporary file
+    next to the output and copied in when the writer is closed, so the
+    memory use does not depend on the size of the dataset.
+
+    The result is the same as json.dump of the label object the converters
+    used to build in memory, with the keys in the order info, licenses,
+    images, type, annotations, categories. The file only appears under its
+    final name once it is complete.
+    """
+
+    def __init__(self, output_file: str, info: dict, licenses: List[dict],
+                 categories: List[dict]):
+        self.output_file = output_file
+        self.categories = categories
+        self.num_images = 0
+        self.num_annotations = 0
+
+        self._images_file = '{}.tmp'.format(output_file)
+        self._annotations_file = '{}.annotations.tmp'.format(output_file)
+        self._f_images = open(self._images_file, 'w')
+        self._f_annotations = open(self._annotations_file, 'w')
+
+        self._f_images.write(_coco_header(info, licenses))
+
+    def add_image(self, obj_im: dict):
+        if self.num_images:
+            self._f_images.write(COCO_SEPARATOR)
+        self._f_images.write(json.dumps(obj_im))
+        self.num_images += 1
+
+    def add_annotation(self, obj_ann: dict):
+        if self.num_annotations:
+            self._f_annotations.write(COCO_SEPARATOR)
+        self._f_annotations.write(json.dumps(obj_ann))
+        self.num_annotations += 1
+
+    def add_annotations(self, image_id: int, boxes: BoxArray,
+                        first_id: int) -> int:
+        """
+        Adds the boxes of an image with consecutive ids starting at first_id.
+
+        :return: the id following the last added annotation
+        """
+        areas = boxes.area
+        bboxes = boxes.to_xywh()
+        labels = boxes.label.tolist()
+        if len(boxes) and np.isfinite(areas).all() and \
+                np.isfinite(bboxes).all():
+            if self.num_annotations:
+                self._f_annotations.write(COCO_SEPARATOR)
+            self._f_annotations.write(COCO_SEPARATOR.join(
+                COCO_ANNOTATION.format(image_id, first_id + k, area, label,
+                                       *bbox)
+                for k, (area, label, bbox) in enumerate(
+                    zip(areas.tolist(), labels, bboxes.tolist()))))
+            self.num_annotations += len(boxes)
+            return first_id + len(boxes)
+
+        # json.dumps writes NaN and Infinity
+        areas = areas.tolist()
+        bboxes = bboxes.tolist()
+        for k in range(len(boxes)):
+            self.add_annotation({
+                'segmentation': [],
+                'iscrowd': 0,
+                'image_id': image_id,
+                'id': first_id + k,
+                'area': areas[k],
+                'category_id': labels[k],
+                'bbox': bboxes[k]
+            })
+        return first_id + len(boxes)
+
+    def close(self):
+        self._f_annotations.close()
+        self._f_images.write(COCO_IMAGES_END)
+        with open(self._annotations_file, 'r') as f:
+            shutil.copyfileobj(f, self._f_images)
+        self._f_images.write(_coco_footer(self.categories))
+        self._f_images.close()
+
+        os.replace(self._images_file, self.output_file)
+        os.remove(self._annotations_file)
+
+    def abort(self):
+        self._f_annotations.close()
+        self._f_images.close()
+        for f in [self._images_file, self._annotations_file]:
+            if os.path.exists(f):
+                os.remove(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def shard_file_name(output_file: str, shard: int, num_shards: int) -> str:
+    return '{}-{:05d}-of-{:05d}.json'.format(
+        os.path.splitext(output_file)[0], shard, num_shards)
+
+
+def shard_index_file_name(output_file: str) -> str:
+    return '{}.index.json'.format(os.path.splitext(output_file)[0])
+
+
+class ShardedCocoWriter(object):
+    """
+    Writes a COCO annotation file as num_shards files, each a complete
+    COCO file with a contiguous range of the num_images expected images and
+    their annotations. The ids are those of the unsharded file, so they are
+    unique over all shards. Annotations go to the shard of the next image
+    added, as in CocoSink which adds the annotations of an image first.
+
+    On close an index {output}.index.json with the shard files and their
+    sizes is written, see merge_coco_shards.
+    """
+
+    def __init__(self, output_file: str, info: dict, licenses: List[dict],
+                 categories: List[dict], num_shards: int, num_images: int):
+        self.output_file = output_file
+        self.info = info
+        self.licenses = licenses
+        self.categories = categories
+        self.num_images_expected = max(num_images, 1)
+        self.num_images = 0
+        self.num_annotations = 0
+        self.shards = [CocoWriter(shard_file_name(output_file, k, num_shards),
+                                  info, licenses, categories)
+                       for k in range(num_shards)]
+
+    def _shard(self) -> CocoWriter:
+        k = self.num_images * len(self.shards) // self.num_images_expected
+        return self.shards[min(k, len(self.shards) - 1)]
+
+    def add_image(self, obj_im: dict):
+        self._shard().add_image(obj_im)
+        self.num_images += 1
+
+    def add_annotation(self, obj_ann: dict):
+        self._shard().add_annotation(obj_ann)
+        self.num_annotations += 1
+
+    def add_annotations(self, image_id: int, boxes: BoxArray,
+                        first_id: int) -> int:
+        self.num_annotations += len(boxes)
+        return self._shard().add_annotations(image_id, boxes, first_id)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        index_file = shard_index_file_name(self.output_file)
+        with open('{}.tmp'.format(index_file), 'w') as f:
+            json.dump({
+                'info': self.info,
+                'licenses': self.licenses,
+                'categories': self.categories,
+                'num_images': self.num_images,
+                'num_annotations': self.num_annotations,
+                'shards': [{
+                    'file': os.path.basename(shard.output_file),
+                    'num_images': shard.num_images,
+                    'num_annotations': shard.num_annotations
+                } for shard in self.shards]
+            }, f, indent=2)
+        os.replace('{}.tmp'.format(index_file), index_file)
+
+    def abort(self):
+        for shard in self.shards:
+            shard.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def load_shard_index(index_file: str) -> Tuple[dict, List[str]]:
+    """
+    :return: the index and the paths of its shard files
+    """
+    with open(index_file, 'r') as f:
+        index = json.load(f)
+    folder = os.path.dirname(index_file)
+    return index, [os.path.join(folder, shard['file'])
+                   for shard in index['shards']]
+
+
+def _scan_shard(task) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """
+    Finds the images and annotations of a file written by CocoWriter
+    without parsing it.
+
+    :return: the (start, end) byte offsets of the images and of the
+        annotations
+    """
+    path, header, footer = task
+    with open(path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(header)] != header or mm[-len(footer):] != footer:
+            raise ValueError('{} was not written with the info, licenses '
+                             'and categories of the index'.format(path))
+        mid = mm.find(COCO_IMAGES_END.encode(), len(header))
+        if mid < 0:
+            raise ValueError('{} is no COCO shard'.format(path))
+        start = mid + len(COCO_IMAGES_END)
+        return (len(header), mid), (start, len(mm) - len(footer))
+
+
+def _copy_range(task):
+    src, start, end, dst, offset = task
+    fd = os.open(dst, os.O_WRONLY)
+    try:
+        with open(src, 'rb') as f:
+            f.seek(start)
+            while start < end:
+                data = f.read(min(end - start, 16 << 20))
+                os.pwrite(fd, data, offset)
+                start += len(data)
+                offset += len(data)
+    finally:
+        os.close(fd)
+
+
+def merge_coco_shards(index_file: str, output_file: str,
+                      workers: int = 1):
+    """
+    Concatenates the shards of a ShardedCocoWriter into a single COCO file,
+    which is the same as the unsharded output. The shards are not parsed:
+    their images and annotations are located in parallel, then every part
+    is copied to its precomputed position of the output in parallel.
+    """
+    index, shard_files = load_shard_index(index_file)
+    header = _coco_header(index['info'], index['licenses']).encode()
+    footer = _coco_footer(index['categories']).encode()
+    ranges = list(ordered_map(_scan_shard,
+                              [(f, header, footer) for f in shard_files],
+                              workers=workers, chunksize=1))
+
+    # the layout of the output, the separators are written here and the
+    # parts of the shards by the workers
+    tmp_file = '{}.tmp'.format(output_file)
+    tasks = []
+    offset = 0
+    with open(tmp_file, 'wb') as f:
+        def put(data: bytes):
+            nonlocal offset
+            f.seek(offset)
+            f.write(data)
+            offset += len(data)
+
+        put(header)
+        for part, end in [(0, COCO_IMAGES_END.encode()), (1, footer)]:
+            first = True
+            for shard_file, shard_ranges in zip(shard_files, ranges):
+                start, stop = shard_ranges[part]
+                if start == stop:
+                    continue
+                if not first:
+                    put(COCO_SEPARATOR.encode())
+                first = False
+                tasks += [(shard_file, start, stop, tmp_file, offset)]
+                offset += stop - start
+            put(end)
+        f.truncate(offset)
+
+    try:
+        for _ in ordered_map(_copy_range, tasks, workers=workers,
+                             chunksize=1):
+            pass
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+    os.replace(tmp_file, output_file)
+
+
+def load_coco_by_file_name(path: str) -> dict:
+    """
+    Reads an existing COCO annotation file and groups it by image.
+
+    :return: {file_name: (image entry, [annotation entries])}, empty if the
+        file does not exist. For an index of shards, all shards are read.
+    """
+    if path.endswith('.index.json') and os.path.exists(path):
+        by_file_name = {}
+        for shard_file in load_shard_index(path)[1]:
+            by_file_name.update(load_coco_by_file_name(shard_file))
+        return by_file_name
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        obj = json.load(f)
+    by_id = {}
+    for obj_im in obj['images']:
+        by_id[obj_im['id']] = (obj_im, [])
+    for obj_ann in obj['annotations']:
+        if obj_ann['image_id'] in by_id:
+            by_id[obj_ann['image_id']][1].append(obj_ann)
+    return {obj_im['file_name']: (obj_im, anns)
+            for obj_im, anns in by_id.values()}
@@ -0,0 +1,328 @@
+import json
+import os
+import shutil
+
+import numpy as np
+from typing import List, Optional
+
+from utils.boxes import BoxArray
+from utils.coco import CocoWriter
+
+COCO_BINARY_VERSION = 1
+
+# columns of the annotations, one row per annotation in image order
+ANNOTATION_COLUMNS = {
+    'id': np.int64,
+    'image_id': np.int64,
+    'category_id': np.int64,
+    'iscrowd': np.int64,
+    'area': np.float64,
+}
+# numeric columns of the images, the strings are stored as
+# images_{name}_data (utf-8) and images_{name}_offsets
+IMAGE_COLUMNS = ['id', 'license', 'height', 'width']
+IMAGE_STRINGS = ['file_name', 'url', 'date_captured']
+# number of images of which the columns are buffered before they are
+# appended to the spool files
+SPOOL_BATCH = 4096
+
+
+class _Column(object):
+    """
+    Values of one array spooled to a raw file, written as .npy on save.
+    """
+
+    def __init__(self, path: str, dtype, width: Optional[int] = None):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.size = 0
+        self._f = open(path, 'wb')
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        self._f.write(values.tobytes())
+        self.size += values.size
+
+    def save(self, npy_file: str):
+        self._f.close()
+        shape = (self.size,) if self.width is None else \
+            (self.size // self.width, self.width)
+        if self.size:
+            # copied through memory maps, not read into memory
+            out = np.lib.format.open_memmap(npy_file, mode='w+',
+                                            dtype=self.dtype, shape=shape)
+            out[...] = np.memmap(self.path, dtype=self.dtype, mode='r',
+                                 shape=shape)
+            out.flush()
+            del out
+        else:
+            # empty files can not be mapped
+            np.save(npy_file, np.zeros(shape, dtype=self.dtype))
+        os.remove(self.path)
+
+    def close(self):
+        self._f.close()
+
+
+class CocoBinaryWriter(object):
+    """
+    Writes the content of a COCO annotation file as a folder of .npy files,
+    which CocoBinary memory maps:
+
+    bbox (n, 4), area, category_id, image_id, id, iscrowd: the annotations
+        in image order
+    offsets (images + 1): the annotations of image i are the rows
+        offsets[i]:offsets[i + 1]
+    images_{id,license,height,width} and images_{file_name,url,date_captured}
+        as utf-8 data with offsets: the image entries
+    meta.json: info, licenses and categories
+
+    As in CocoSink, the annotations of an image are added before the image.
+    As in CocoWriter the memory use does not depend on the size of the
+    dataset: the columns are spooled to raw files in batches of SPOOL_BATCH
+    images. They are written to a temporary folder, which is renamed on
+    close.
+    """
+
+    def __init__(self, folder: str, info: dict, licenses: List[dict],
+                 categories: List[dict]):
+        self.folder = folder
+        self.meta = {
+            'version': COCO_BINARY_VERSION,
+            'info': info,
+            'licenses': licenses,
+            'categories': categories
+        }
+        # the images and annotation chunks of the current batch
+        self.images = []
+        self.offsets = []
+        self.chunks = []
+        self.num_annotations = 0
+
+        self._tmp_folder = '{}.tmp'.format(folder)
+        if os.path.exists(self._tmp_folder):
+            shutil.rmtree(self._tmp_folder)
+        os.makedirs(self._tmp_folder)
+        names = [('bbox', np.float64), ('offsets', np.int64)] + \
+            list(ANNOTATION_COLUMNS.items()) + \
+            [('images_{}'.format(name), np.int64) for name in IMAGE_COLUMNS]
+        for name in IMAGE_STRINGS:
+            names += [('images_{}_data'.format(name), np.uint8),
+                      ('images_{}_offsets'.format(name), np.int64)]
+        self._columns = {
+            name: _Column(os.path.join(self._tmp_folder,
+                                       '{}.raw'.format(name)), dtype,
+                          4 if name == 'bbox' else None)
+            for name, dtype in names}
+        # the leading zeros of the offsets
+        self._columns['offsets'].append([0])
+        self._string_ends = {}
+        for name in IMAGE_STRINGS:
+            self._columns['images_{}_offsets'.format(name)].append([0])
+            self._string_ends[name] = 0
+
+    def add_image(self, obj_im: dict):
+        self.images += [obj_im]
+        self.offsets += [self.num_annotations]
+        if len(self.images) >= SPOOL_BATCH:
+            self._spool()
+
+    def add_annotation(self, obj_ann: dict):
+        if obj_ann['segmentation']:
+            raise ValueError('Segmentations are not supported')
+        self.chunks += [{
+            'bbox': np.array([obj_ann['bbox']], dtype=np.float64),
+            'id': [obj_ann['id']],
+            'image_id': [obj_ann['image_id']],
+            'category_id': [obj_ann['category_id']],
+            'iscrowd': [obj_ann['iscrowd']],
+            'area': [obj_ann['area']],
+        }]
+        self.num_annotations += 1
+
+    def add_annotations(self, image_id: int, boxes: BoxArray,
+                        first_id: int) -> int:
+        n = len(boxes)
+        self.chunks += [{
+            'bbox': boxes.to_xywh(),
+            'id': np.arange(first_id, first_id + n),
+            'image_id': np.full(n, image_id),
+            'category_id': boxes.label,
+            'iscrowd': np.zeros(n),
+            'area': boxes.area,
+        }]
+        self.num_annotations += n
+        return first_id + n
+
+    def _spool(self):
+        """
+        Appends the images and annotations of the batch to the columns.
+        """
+        if self.chunks:
+            self._columns['bbox'].append(
+                np.concatenate([c['bbox'] for c in self.chunks]))
+            for name, dtype in ANNOTATION_COLUMNS.items():
+                self._columns[name].append(np.concatenate(
+                    [np.asarray(c[name], dtype=dtype) for c in self.chunks]))
+        self._columns['offsets'].append(self.offsets)
+        for name in IMAGE_COLUMNS:
+            self._columns['images_{}'.format(name)].append(
+                [obj_im[name] for obj_im in self.images])
+        for name in IMAGE_STRINGS:
+            encoded = [obj_im[name].encode('utf-8') for obj_im in self.images]
+            ends = np.cumsum([len(v) for v in encoded], dtype=np.int64)
+            self._columns['images_{}_data'.format(name)].append(
+                np.frombuffer(b''.join(encoded), dtype=np.uint8))
+            self._columns['images_{}_offsets'.format(name)].append(
+                ends + self._string_ends[name])
+            if len(ends):
+                self._string_ends[name] += int(ends[-1])
+        self.images = []
+        self.offsets = []
+        self.chunks = []
+
+    def close(self):
+        self._spool()
+        for name, column in self._columns.items():
+            column.save(os.path.join(self._tmp_folder,
+                                     '{}.npy'.format(name)))
+        with open(os.path.join(self._tmp_folder, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+
+        if os.path.exists(self.folder):
+            shutil.rmtree(self.folder)
+        os.replace(self._tmp_folder, self.folder)
+
+    def abort(self):
+        self.chunks = []
+        self.images = []
+        for column in self._columns.values():
+            column.close()
+        if os.path.exists(self._tmp_folder):
+            shutil.rmtree(self._tmp_folder)
+
+
+class CocoBinary(object):
+    """
+    Memory mapped view of a folder written by CocoBinaryWriter. Opening it
+    only reads meta.json and the array headers, the arrays are paged in on
+    access.
+    The per image lookups return views of the mapped arrays.
+
+        cache = CocoBinary('annotations/instances_train2017.cache')
+        bbox = cache.boxes(i)  # (n, 4) x, y, w, h of the i-th image
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        with open(os.path.join(folder, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        if meta['version'] != COCO_BINARY_VERSION:
+            raise ValueError('Unsupported version {} of {}'.format(
+                meta['version'], folder))
+        self.info = meta['info']
+        self.licenses = meta['licenses']
+        self.categories = meta['categories']
+        self._id_index = None
+
+        self.bbox = self._load('bbox')
+        for name in ANNOTATION_COLUMNS:
+            setattr(self, name, self._load(name))
+        self.offsets = self._load('offsets')
+        self.images = {name: self._load('images_{}'.format(name))
+                       for name in IMAGE_COLUMNS}
+        self.strings = {name: (self._load('images_{}_data'.format(name)),
+                               self._load('images_{}_offsets'.format(name)))
+                        for name in IMAGE_STRINGS}
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.folder, '{}.npy'.format(name)),
+                       mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _string(self, name: str, i: int) -> str:
+        data, offsets = self.strings[name]
+        return bytes(data[offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+    def index_of(self, image_id: int) -> int:
+        """
+        :return: the position of the image with the id image_id
+        """
+        if self._id_index is None:
+            self._id_index = {v: i for i, v in
+                              enumerate(self.images['id'].tolist())}
+        return self._id_index[image_id]
+
+    def annotation_range(self, i: int) -> slice:
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def boxes(self, i: int) -> np.ndarray:
+        """
+        :return: the [x, y, w, h] boxes of the i-th image, a view
+        """
+        return self.bbox[self.annotation_range(i)]
+
+    def image(self, i: int) -> dict:
+        """
+        :return: the COCO entry of the i-th image
+        """
+        return {
+            'license': int(self.images['license'][i]),
+            'url': self._string('url', i),
+            'file_name': self._string('file_name', i),
+            'height': int(self.images['height'][i]),
+            'width': int(self.images['width'][i]),
+            'date_captured': self._string('date_captured', i),
+            'id': int(self.images['id'][i])
+        }
+
+    def annotations(self, i: int) -> List[dict]:
+        """
+        :return: the COCO entries of the annotations of the i-th image
+        """
+        r = self.annotation_range(i)
+        columns = [getattr(self, name)[r].tolist()
+                   for name in ['iscrowd', 'image_id', 'id', 'area',
+                                'category_id']]
+        return [{
+            'segmentation': [],
+            'iscrowd': iscrowd,
+            'image_id': image_id,
+            'id': ann_id,
+            'area': area,
+            'category_id': category_id,
+            'bbox': bbox
+        } for iscrowd, image_id, ann_id, area, category_id, bbox in
+            zip(*columns, self.bbox[r].tolist())]
+
+    def write_coco(self, output_file: str,
+                   info: Optional[dict] = None):
+        """
+        Writes the COCO annotation file, which is the same as the one the
+        cache was written alongside.
+        """
+        with CocoWriter(output_file, info or self.info, self.licenses,
+                        self.categories) as writer:
+            for i in range(len(self)):
+                for obj_ann in self.annotations(i):
+                    writer.add_annotation(obj_ann)
+                writer.add_image(self.image(i))
+
+    def to_coco(self) -> dict:
+        """
+        :return: the COCO label object, as json.load of the annotation file
+        """
+        images = [self.image(i) for i in range(len(self))]
+        annotations = [obj_ann for i in range(len(self))
+                       for obj_ann in self.annotations(i)]
+        return {
+            'info': self.info,
+            'licenses': self.licenses,
+            'images': images,
+            'type': 'instances',
+            'annotations': annotations,
+            'categories': self.categories
+        }
@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+from typing import Dict, List
+
+COCO_INDEX_VERSION = 1
+
+
+def coco_index_file_name(output_file: str) -> str:
+    return '{}.lookup.npz'.format(os.path.splitext(output_file)[0])
+
+
+class CocoIndexWriter(object):
+    """
+    Collects the relations of a COCO annotation file while it is written
+    and saves them as CSR arrays, so the consumers do not have to build
+    imgToAnns, catToImgs and the id lookups from the json:
+
+    image_ids: the image ids in file order
+    ann_offsets, ann_ids, ann_category_ids: the annotations of the i-th
+        image are ann_ids[ann_offsets[i]:ann_offsets[i + 1]], in file order
+    category_ids, cat_offsets, cat_image_ids: the images with a box of the
+        j-th category are cat_image_ids[cat_offsets[j]:cat_offsets[j + 1]]
+    cat_counts: the number of annotations per category
+    image_order, ann_order: the permutations sorting image_ids and ann_ids
+
+    The sidecar covers the logical file, for sharded output the merged one.
+    """
+
+    def __init__(self, output_file: str, categories: List[dict]):
+        self.output_file = output_file
+        self.category_ids = np.array([c['id'] for c in categories],
+                                     dtype=np.int64)
+        self.image_ids = []
+        self.counts = []
+        self.ann_ids = []
+        self.ann_category_ids = []
+
+    def add_image(self, image_id: int, ann_ids, category_ids):
+        """
+        :param ann_ids: the ids of the annotations of the image in file order
+        :param category_ids: their category ids
+        """
+        self.image_ids += [image_id]
+        self.counts += [len(ann_ids)]
+        self.ann_ids += [np.asarray(ann_ids, dtype=np.int64)]
+        self.ann_category_ids += [np.asarray(category_ids, dtype=np.int64)]
+
+    def close(self):
+        empty = [np.zeros(0, dtype=np.int64)]
+        image_ids = np.array(self.image_ids, dtype=np.int64)
+        ann_offsets = np.zeros(len(image_ids) + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=ann_offsets[1:])
+        ann_ids = np.concatenate(self.ann_ids + empty)
+        ann_category_ids = np.concatenate(self.ann_category_ids + empty)
+
+        # position of the image and the category of every annotation
+        positions = np.repeat(np.arange(len(image_ids)),
+                              np.diff(ann_offsets))
+        sorter = np.argsort(self.category_ids)
+        categories = sorter[np.searchsorted(self.category_ids,
+                                            ann_category_ids, sorter=sorter)]
+        # unique (category, image) pairs, sorted by category and file order
+        pairs = np.unique(categories * len(image_ids) + positions)
+        pair_categories = pairs // max(len(image_ids), 1)
+        cat_offsets = np.zeros(len(self.category_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pair_categories,
+                              minlength=len(self.category_ids)),
+                  out=cat_offsets[1:])
+
+        tmp_file = '{}.tmp.npz'.format(os.path.splitext(self.output_file)[0])
+        np.savez(tmp_file,
+                 version=np.array(COCO_INDEX_VERSION),
+                 image_ids=image_ids,
+                 image_order=np.argsort(image_ids, kind='stable'),
+                 ann_offsets=ann_offsets,
+                 ann_ids=ann_ids,
+                 ann_order=np.argsort(ann_ids, kind='stable'),
+                 ann_category_ids=ann_category_ids,
+                 category_ids=self.category_ids,
+                 cat_offsets=cat_offsets,
+                 cat_image_ids=image_ids[pairs % max(len(image_ids), 1)],
+                 cat_counts=np.bincount(
+                     categories, minlength=len(self.category_ids)))
+        os.replace(tmp_file, self.output_file)
+
+    def abort(self):
+        self.image_ids = []
+        self.counts = []
+        self.ann_ids = []
+        self.ann_category_ids = []
+
+
+class CocoIndex(object):
+    """
+    Lookups of a COCO annotation file from the sidecar of CocoIndexWriter.
+    The arrays are only read on first use, the lookups are binary searches.
+
+        index = CocoIndex('annotations/instances_train2017.lookup.npz')
+        ann_ids = index.ann_ids_of_image(image_id)  # imgToAnns
+        image_ids = index.image_ids_of_category(3)  # catToImgs
+        i = index.image_position(image_id)  # position in 'images'
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._npz = np.load(path)
+        if int(self._npz['version']) != COCO_INDEX_VERSION:
+            raise ValueError('Unsupported version {} of {}'.format(
+                int(self._npz['version']), path))
+        self._arrays = {}
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name not in self._arrays:
+            if name not in self._npz.files:
+                raise AttributeError(name)
+            self._arrays[name] = self._npz[name]
+        return self._arrays[name]
+
+    def __len__(self) -> int:
+        return len(self.image_ids)
+
+    @staticmethod
+    def _position(ids: np.ndarray, order: np.ndarray, value: int) -> int:
+        i = np.searchsorted(ids, value, sorter=order)
+        if i == len(ids) or ids[order[i]] != value:
+            raise KeyError(value)
+        return int(order[i])
+
+    def image_position(self, image_id: int) -> int:
+        """
+        :return: the position of the image in the images of the file
+        """
+        return self._position(self.image_ids, self.image_order, image_id)
+
+    def annotation_position(self, ann_id: int) -> int:
+        """
+        :return: the position of the annotation in the annotations of the
+            file
+        """
+        return self._position(self.ann_ids, self.ann_order, ann_id)
+
+    def ann_ids_of_image(self, image_id: int) -> np.ndarray:
+        i = self.image_position(image_id)
+        return self.ann_ids[self.ann_offsets[i]:self.ann_offsets[i + 1]]
+
+    def image_ids_of_category(self, category_id: int) -> np.ndarray:
+        j = self._position(self.category_ids,
+                           np.argsort(self.category_ids), category_id)
+        return self.cat_image_ids[
+            self.cat_offsets[j]:self.cat_offsets[j + 1]]
+
+    def category_counts(self) -> Dict[int, int]:
+        """
+        :return: {category id: number of annotations}
+        """
+        return dict(zip(self.category_ids.tolist(),
+                        self.cat_counts.tolist()))
+
+    def close(self):
+        self._npz.close()
@@ -0,0 +1,24 @@
+import errno
+import os
+import re
+
+
+def get_files_in_path(path, m_regex=None):
+    if m_regex is not None:
+        if isinstance(m_regex, str):
+            m_regex = re.compile(m_regex)
+    files = os.listdir(path)
+    if m_regex:
+        files = [f for f in files if m_regex.search(f) is not None]
+    files = [os.path.join(path, f) for f in files]
+    return files
+
+
+def mkdir_p(path):
+    try:
+        os.makedirs(path)
+    except OSError as exc:  # Python >2.5
+        if exc.errno == errno.EEXIST and os.path.isdir(path):
+            pass
+        else:
+            raise
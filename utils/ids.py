@@ -0,0 +1,90 @@
+import hashlib
+import os
+
+ID_SCHEMES = ['sequential', 'hash']
+
+# the hashed image ids have HASH_IMAGE_BITS bits, the annotation ids are
+# image_id << HASH_ANNOTATION_BITS | k for the k-th box of the image
+HASH_IMAGE_BITS = 48
+HASH_ANNOTATION_BITS = 12
+
+
+def stable_image_id(fold: str, key: str) -> int:
+    """
+    :return: an id of the image key of a fold which only depends on the fold
+        and the stem of key
+    """
+    stem = os.path.splitext(key)[0]
+    digest = hashlib.blake2b('{}/{}'.format(fold, stem).encode('utf-8'),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, 'big') >> (64 - HASH_IMAGE_BITS)
+
+
+class IdAllocator(object):
+    """
+    Assigns the COCO image and annotation ids, unique over all folds of a
+    run and independent of the number of workers and of the images taken
+    from a previous run.
+
+    sequential: the image id is the position in the fold listing plus the
+        length of the listings of the previous folds, as given to
+        begin_fold, the annotation ids are the prefix sum over the box
+        counts of the images in order.
+    hash: the image id is stable_image_id of the fold and the image stem,
+        the annotation ids are image_id << HASH_ANNOTATION_BITS | k. The ids
+        stay the same if images are added or removed, a collision of two
+        image ids raises a ValueError.
+    """
+
+    def __init__(self, scheme: str = 'sequential'):
+        if scheme not in ID_SCHEMES:
+            raise ValueError('Unknown id scheme: {}'.format(scheme))
+        self.scheme = scheme
+        self.fold = None
+        self.image_offset = 0
+        self.listing_size = 0
+        self.annotation_id = 0
+        self.image_ids = set()
+
+    def begin_fold(self, fold: str, listing_size: int):
+        """
+        :param listing_size: the length of the full fold listing, images
+            without labels included, also if only a subset of it is
+            converted
+        """
+        self.fold = fold
+        self.image_offset += self.listing_size
+        self.listing_size = listing_size
+
+    def image_id(self, index: int, key: str) -> int:
+        """
+        :param index: the position of the image in the fold listing
+        """
+        if self.scheme == 'sequential':
+            if index >= self.listing_size:
+                raise ValueError('Position {} of {} is outside of the '
+                                 'listing of {}'.format(index, key,
+                                                        self.fold))
+            return self.image_offset + index
+        image_id = stable_image_id(self.fold, key)
+        if image_id in self.image_ids:
+            raise ValueError('Image id collision of {} in {}, use the '
+                             'sequential id scheme'.format(key, self.fold))
+        self.image_ids.add(image_id)
+        return image_id
+
+    def annotation_ids(self, image_id: int, n: int) -> int:
+        """
+        Allocates the ids of the n annotations of an image, which are
+        consecutive.
+
+        :return: the first id
+        """
+        if self.scheme == 'sequential':
+            first_id = self.annotation_id
+            self.annotation_id += n
+            return first_id
+        if n > 1 << HASH_ANNOTATION_BITS:
+            raise ValueError('More than {} boxes in an image'.format(
+                1 << HASH_ANNOTATION_BITS))
+        return image_id << HASH_ANNOTATION_BITS
@@ -0,0 +1,146 @@
+import io
+import json
+import os
+import struct
+
+from typing import Optional, Tuple
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# start of frame markers, which carry the dimensions of a jpeg. 0xc4 (DHT),
+# 0xc8 (JPG) and 0xcc (DAC) share the range but are no frame headers
+JPEG_SOF_MARKERS = set(range(0xc0, 0xd0)) - {0xc4, 0xc8, 0xcc}
+
+
+def _png_size(f) -> Optional[Tuple[int, int]]:
+    header = f.read(24)
+    if len(header) < 24 or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+
+def _jpeg_header(f) -> Optional[Tuple[int, int, int]]:
+    f.seek(2)
+    while True:
+        if f.read(1) != b'\xff':
+            return None
+        marker = f.read(1)
+        # skip the fill bytes in front of the marker
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = ord(marker)
+        if marker == 0x01 or 0xd0 <= marker <= 0xd8:
+            # markers without a payload
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        length, = struct.unpack('>H', length)
+        if marker in JPEG_SOF_MARKERS:
+            segment = f.read(6)
+            if len(segment) < 6:
+                return None
+            height, width, components = struct.unpack('>HHB', segment[1:6])
+            return width, height, components
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _open(path: str, data: Optional[bytes] = None):
+    if data is not None:
+        return io.BytesIO(data)
+    return open(path, 'rb')
+
+
+def get_image_size(path: str, data: Optional[bytes] = None) \
+        -> Tuple[int, int]:
+    """
+    Reads the dimensions of an image without decoding the pixel data. Only
+    the header of jpeg and png files is parsed, other formats are handed to
+    PIL which opens them lazily as well. If given, the content of the image
+    is taken from data instead of path.
+
+    :return: (width, height)
+    """
+    with _open(path, data) as f:
+        signature = f.read(8)
+        size = None
+        if signature.startswith(PNG_SIGNATURE):
+            f.seek(0)
+            size = _png_size(f)
+        elif signature.startswith(b'\xff\xd8'):
+            size = _jpeg_header(f)
+            size = size[:2] if size is not None else None
+    if size is not None:
+        return size
+
+    from PIL import Image
+    with Image.open(path if data is None else io.BytesIO(data)) as pil_im:
+        return pil_im.size
+
+
+def get_image_format(path: str, data: Optional[bytes] = None) \
+        -> Tuple[Optional[str], Optional[int]]:
+    """
+    Detects jpeg and png files by their signature.
+
+    :return: (format, number of color components) with the format as named
+        by PIL, or None for other formats. The number of components is only
+        read for jpeg files.
+    """
+    with _open(path, data) as f:
+        signature = f.read(8)
+        if signature.startswith(PNG_SIGNATURE):
+            return 'PNG', None
+        if signature.startswith(b'\xff\xd8'):
+            header = _jpeg_header(f)
+            return 'JPEG', header[2] if header is not None else None
+    return None, None
+
+
+class ImageSizeCache(object):
+    """
+    Cache of image dimensions keyed by the path of the image. An entry is
+    only used while the modification time and the file size of the image
+    are unchanged.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None):
+        self.cache_file = cache_file
+        self.entries = {}
+        if cache_file is not None and os.path.exists(cache_file):
+            with open(cache_file, 'r') as f:
+                self.entries = json.load(f)
+
+    def lookup(self, path: str) -> Optional[Tuple[int, int]]:
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        st = os.stat(path)
+        mtime, size, width, height = entry
+        if mtime != st.st_mtime_ns or size != st.st_size:
+            return None
+        return width, height
+
+    def store(self, path: str, size: Tuple[int, int]):
+        # without a cache file the entries are never used, the stat is saved
+        if self.cache_file is None:
+            return
+        st = os.stat(path)
+        self.entries[path] = [st.st_mtime_ns, st.st_size, size[0], size[1]]
+
+    def get(self, path: str) -> Tuple[int, int]:
+        """
+        :return: (width, height)
+        """
+        size = self.lookup(path)
+        if size is None:
+            size = get_image_size(path)
+            self.store(path, size)
+        return size
+
+    def save(self):
+        if self.cache_file is None:
+            return
+        with open(self.cache_file, 'w') as f:
+            json.dump(self.entries, f)
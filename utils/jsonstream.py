@@ -0,0 +1,133 @@
+import json
+import re
+
+from typing import Iterator
+
+WHITESPACE = ' \t\n\r'
+WHITESPACE_RUN = re.compile(r'[ \t\n\r]*')
+DELIMITERS = set(WHITESPACE + ',:]}') | {''}
+
+
+class JsonStream(object):
+    """
+    Incremental reader for large json files. The file is read in chunks and
+    only the value which is currently decoded is kept in memory, so the
+    elements of a huge array can be iterated without loading the whole
+    document.
+
+        for frame in JsonStream(f).array():
+            ...
+
+    Objects are walked with items(), which yields the keys; the value of
+    each key has to be consumed with value() or array() before the next key
+    is requested.
+    """
+
+    def __init__(self, f, chunk_size: int = 1 << 20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # drop the consumed part of the buffer
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        :return: the next character which is not white space, '' at the end
+        """
+        while True:
+            self.pos = WHITESPACE_RUN.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if c == '' or c not in chars:
+            raise ValueError('Expected one of {!r} at offset {}, got '
+                             '{!r}'.format(chars, self.pos, c))
+        self.pos += 1
+        return c
+
+    def value(self):
+        """
+        Decodes the next complete value.
+        """
+        self.peek()
+        while True:
+            try:
+                # the scanner of raw_decode, without its python wrapper
+                obj, end = self.decoder.scan_once(self.buf, self.pos)
+            except (StopIteration, json.JSONDecodeError):
+                if not self._fill():
+                    # raises the error with its message
+                    self.decoder.raw_decode(self.buf, self.pos)
+                continue
+            # a number at the end of the buffer might continue in the next
+            # chunk, so a value is only taken once a delimiter follows it
+            if self.buf[end:end + 1] in DELIMITERS and \
+                    (end < len(self.buf) or self.eof):
+                self.pos = end
+                return obj
+            if not self._fill() and end < len(self.buf):
+                raise ValueError('Invalid json value at offset {}'.format(
+                    self.pos))
+
+    def array(self) -> Iterator:
+        """
+        Yields the elements of the next array one at a time.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        scan_once = self.decoder.scan_once
+        skip = WHITESPACE_RUN.match
+        while True:
+            yield self.value()
+            # fast path for the elements which are complete in the buffer,
+            # the general one handles the chunk boundaries
+            while True:
+                buf = self.buf
+                pos = skip(buf, self.pos).end()
+                if buf[pos:pos + 1] != ',':
+                    break
+                pos = skip(buf, pos + 1).end()
+                try:
+                    obj, end = scan_once(buf, pos)
+                except (StopIteration, json.JSONDecodeError):
+                    break
+                if end >= len(buf) or buf[end] not in DELIMITERS:
+                    break
+                self.pos = end
+                yield obj
+            if self.expect(',]') == ']':
+                return
+
+    def items(self) -> Iterator[str]:
+        """
+        Yields the keys of the next object, see the class documentation.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
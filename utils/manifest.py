@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+
+from typing import List, Optional
+
+MANIFEST_VERSION = 1
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Manifest(object):
+    """
+    Fingerprints (size, mtime and optionally the sha1 of the content) of the
+    source files that went into an export, keyed by an id of the exported
+    item, e.g. the image name. It is used to find the image/label pairs which
+    changed since the last run.
+
+    The manifest of the previous run is read from manifest_file, the
+    fingerprints recorded during the current run replace it on save. The
+    hashes are computed once per file version, a file shared by many items,
+    e.g. the consolidated BDD100K labels, is only read once.
+    """
+
+    def __init__(self, manifest_file: str, with_hash: bool = False):
+        self.manifest_file = manifest_file
+        self.with_hash = with_hash
+        self.previous = {}
+        self.entries = {}
+        self.hashes = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r') as f:
+                obj = json.load(f)
+            if obj.get('version') == MANIFEST_VERSION:
+                self.previous = obj['entries']
+
+    def _hash(self, path: str, st: os.stat_result) -> str:
+        version = (path, st.st_size, st.st_mtime_ns)
+        if version not in self.hashes:
+            self.hashes[version] = file_hash(path)
+        return self.hashes[version]
+
+    def _fingerprint(self, path: str, old: Optional[list] = None) -> list:
+        st = os.stat(path)
+        digest = None
+        if self.with_hash:
+            if old is not None and old[2] is not None and \
+                    old[:2] == [st.st_size, st.st_mtime_ns]:
+                digest = old[2]
+            else:
+                digest = self._hash(path, st)
+        return [st.st_size, st.st_mtime_ns, digest]
+
+    def is_unchanged(self, key: str, paths: List[str]) -> bool:
+        """
+        Checks whether the files of key are the same as in the last run. A
+        file whose mtime changed still counts as unchanged if the manifest
+        stores hashes and the content hash matches.
+        """
+        old = self.previous.get(key)
+        if old is None or len(old) != len(paths):
+            return False
+        for path, fp in zip(paths, old):
+            st = os.stat(path)
+            if fp[:2] == [st.st_size, st.st_mtime_ns]:
+                continue
+            if not self.with_hash or fp[2] is None or fp[0] != st.st_size:
+                return False
+            if self._hash(path, st) != fp[2]:
+                return False
+        return True
+
+    def record(self, key: str, paths: List[str]):
+        old = self.previous.get(key)
+        if old is None or len(old) != len(paths):
+            old = [None] * len(paths)
+        self.entries[key] = [self._fingerprint(p, fp)
+                             for p, fp in zip(paths, old)]
+
+    def stale(self) -> List[str]:
+        """
+        :return: the keys of the last run which were not recorded again
+        """
+        return [key for key in self.previous if key not in self.entries]
+
+    def save(self):
+        tmp_file = '{}.tmp'.format(self.manifest_file)
+        with open(tmp_file, 'w') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'entries': self.entries
+            }, f)
+        os.replace(tmp_file, self.manifest_file)
@@ -0,0 +1,195 @@
+import errno
+import io
+import os
+import shutil
+
+from typing import List, NamedTuple, Optional, Tuple
+
+from utils.imagesize import get_image_format
+
+MATERIALIZE_MODES = ['none', 'symlink', 'hardlink', 'copy',
+                     'transcode-only-if-needed']
+
+# the formats PIL writes for the extensions of the exported images
+EXTENSION_FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+}
+
+# the modes which write a new file and thus can resize the image
+TRANSCODE_MODES = ['copy', 'transcode-only-if-needed']
+
+
+class TranscodeOptions(NamedTuple):
+    """
+    Re-encoding of an image: size is the (width, height) the image is
+    scaled down to fit into, keeping its aspect ratio, quality the jpeg
+    quality of PIL. None keeps the size, respectively PIL's default.
+    """
+    size: Optional[Tuple[int, int]] = None
+    quality: Optional[int] = None
+
+
+# ioctl request of linux to share the extents of two files (reflink)
+FICLONE = 0x40049409
+
+
+def _reflink(src: str, dst: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, 'rb') as f_src, open(dst, 'wb') as f_dst:
+        try:
+            fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+        except OSError:
+            return False
+    shutil.copymode(src, dst)
+    return True
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError as exc:
+        if exc.errno != errno.ENOENT:
+            raise
+
+
+def copy_image(src: str, dst: str):
+    """
+    Copies src to dst, as a reflink if the file system supports it.
+    """
+    if not _reflink(src, dst):
+        shutil.copy(src, dst)
+
+
+def write_copies(data: bytes, paths: List[str]):
+    """
+    Writes the content data of an image to all paths.
+    """
+    for path in paths:
+        if os.path.lexists(path):
+            _remove(path)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def needs_transcode(src: str, dst: str, data: Optional[bytes] = None) \
+        -> bool:
+    """
+    Checks whether src can be used as dst as is. This is the case if both
+    are in the same format and, for jpeg files, src is a three component
+    (rgb) image.
+    """
+    target = EXTENSION_FORMATS.get(os.path.splitext(dst)[1].lower())
+    source, components = get_image_format(src, data)
+    if target is None or source != target:
+        return True
+    return target == 'JPEG' and components != 3
+
+
+def transcode_image(src: str, dst: str, data: Optional[bytes] = None,
+                    options: Optional[TranscodeOptions] = None):
+    """
+    Saves src as rgb image in the format given by the extension of dst.
+    With a size in options, jpeg files are decoded at the smallest scale
+    of the DCT which is still at least that size (PIL's draft mode) before
+    they are resized, which is a lot faster than decoding the full image.
+    """
+    from PIL import Image
+    save_options = {}
+    if options is not None and options.quality is not None:
+        save_options['quality'] = options.quality
+    with Image.open(src if data is None else io.BytesIO(data)) as pil_im:
+        if options is None or options.size is None:
+            pil_im.convert('RGB').save(dst, **save_options)
+            return
+        width, height = pil_im.size
+        scale = min(options.size[0] / width, options.size[1] / height, 1.)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        pil_im.draft('RGB', size)
+        pil_im = pil_im.convert('RGB')
+        if pil_im.size != size:
+            pil_im = pil_im.resize(size, Image.BILINEAR)
+        pil_im.save(dst, **save_options)
+
+
+def materialize_image(src: str, dst: str, mode: str = 'copy',
+                      data: Optional[bytes] = None,
+                      options: Optional[TranscodeOptions] = None):
+    """
+    Makes the image src available as dst. data is the content of src if it
+    was read already. With options, the copy and transcode modes always
+    re-encode the image, see transcode_image.
+
+    none: nothing is written, only the annotations are exported
+    symlink: dst is a symbolic link to the absolute path of src
+    hardlink: dst is a hard link to src, it is copied if linking fails
+        (e.g. across file systems)
+    copy: dst is a copy (or a reflink) of src
+    transcode-only-if-needed: src is decoded and saved as rgb image in the
+        format given by the extension of dst, unless src already is in that
+        format, in which case it is copied
+    """
+    if mode not in MATERIALIZE_MODES:
+        raise ValueError('Unknown materialization mode: {}'.format(mode))
+    if mode == 'none':
+        return
+    if os.path.lexists(dst):
+        _remove(dst)
+
+    if options is not None and mode in TRANSCODE_MODES:
+        transcode_image(src, dst, data, options)
+    elif mode == 'symlink':
+        os.symlink(os.path.abspath(src), dst)
+    elif mode == 'hardlink':
+        try:
+            os.link(src, dst)
+        except OSError:
+            copy_image(src, dst)
+    elif mode == 'copy':
+        copy_image(src, dst)
+    elif needs_transcode(src, dst, data):
+        transcode_image(src, dst, data)
+    else:
+        copy_image(src, dst)
+
+
+def materialize_images(src: str, targets: List[tuple],
+                       data: Optional[bytes] = None) -> List[str]:
+    """
+    Materializes src at several (dst, mode) or (dst, mode, options)
+    targets while reading it at most once for copies and transcodes: a
+    target with the same mode, options and extension as an earlier one is
+    copied (or reflinked) from that target's output instead of from src.
+
+    With data, the content of src, the targets which are plain copies of src
+    are not written, they are left to the caller (see write_copies).
+
+    :return: the targets which still have to be written with data
+    """
+    done = {}
+    copies = []
+    for target in targets:
+        dst, mode = target[:2]
+        options = target[2] if len(target) > 2 else None
+        key = (mode, options, os.path.splitext(dst)[1].lower())
+        if mode in TRANSCODE_MODES and key in done:
+            if done[key] is None:
+                copies += [dst]
+                continue
+            if os.path.lexists(dst):
+                _remove(dst)
+            copy_image(done[key], dst)
+            continue
+        if data is not None and options is None and (
+                mode == 'copy' or mode == 'transcode-only-if-needed' and
+                not needs_transcode(src, dst, data)):
+            copies += [dst]
+            done[key] = None
+            continue
+        materialize_image(src, dst, mode, data, options)
+        done[key] = dst
+    return copies
@@ -0,0 +1,146 @@
+import contextlib
+import json
+import sys
+import threading
+import time
+
+from typing import Optional
+
+# stages of the conversion, in the order of the report
+STAGES = ['list', 'pair', 'prefetch', 'read_label', 'parse', 'probe',
+          'validate', 'materialize', 'write']
+
+# metrics of the current process, see activate
+_active = None
+
+
+class Metrics(object):
+    """
+    Wall time per stage and counters of a conversion. The code reports to
+    the active instance of its process with the module functions stage and
+    count, which do nothing if there is none. The worker processes collect
+    into their own instance per task, which is merged into the one of the
+    main process.
+
+    The stage times of threads and workers add up, so the sum over the
+    stages can exceed the wall time of the run.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, calls: int = 1):
+        with self.lock:
+            total, n = self.stages.get(name, (0., 0))
+            self.stages[name] = (total + seconds, n + calls)
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other: dict):
+        """
+        Adds the stages and counters of Metrics.to_dict of another instance.
+        """
+        for name, entry in other['stages'].items():
+            self.add(name, entry['seconds'], entry['calls'])
+        for name, n in other['counters'].items():
+            self.count(name, n)
+
+    def to_dict(self) -> dict:
+        order = {name: i for i, name in enumerate(STAGES)}
+        with self.lock:
+            return {
+                'seconds': time.time() - self.start,
+                'stages': {name: {'seconds': seconds, 'calls': calls}
+                           for name, (seconds, calls) in sorted(
+                               self.stages.items(),
+                               key=lambda s: (order.get(s[0], len(order)),
+                                              s[0]))},
+                'counters': dict(sorted(self.counters.items()))
+            }
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self) -> str:
+        obj = self.to_dict()
+        width = max([12] + [len(name) for name in obj['counters']])
+        lines = ['{:{}s} {:10.2f}s'.format('total', width, obj['seconds'])]
+        for name, entry in obj['stages'].items():
+            lines += ['{:{}s} {:10.2f}s {:10d} calls'.format(
+                name, width, entry['seconds'], entry['calls'])]
+        for name, n in obj['counters'].items():
+            lines += ['{:{}s} {:10d}'.format(name, width, n)]
+        return '\n'.join(lines)
+
+
+def activate(metrics: Optional[Metrics]) -> Optional[Metrics]:
+    """
+    Makes metrics the active instance of the process.
+
+    :return: the previously active instance
+    """
+    global _active
+    previous, _active = _active, metrics
+    return previous
+
+
+def active() -> Optional[Metrics]:
+    return _active
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    metrics = _active
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - start)
+
+
+def count(name: str, n: int = 1):
+    if _active is not None:
+        _active.count(name, n)
+
+
+class Progress(object):
+    """
+    Prints the progress of a fold with throughput and ETA, at most every
+    interval seconds and once at the end.
+    """
+
+    def __init__(self, label: str, total: int, interval: float = 5.,
+                 stream=None):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.start = time.time()
+        self.last = None
+
+    def update(self, done: int):
+        now = time.time()
+        if done < self.total and self.last is not None and \
+                now - self.last < self.interval:
+            return
+        self.last = now
+        elapsed = now - self.start
+        rate = done / elapsed if elapsed > 0 else 0.
+        if done >= self.total:
+            eta = 'done in {:.1f}s'.format(elapsed)
+        elif rate > 0:
+            eta = 'ETA {:.0f}s'.format((self.total - done) / rate)
+        else:
+            eta = 'ETA unknown'
+        self.stream.write('\t{} {}/{} images, {:.1f} images/s, {}\n'.format(
+            self.label, done, self.total, rate, eta))
+        self.stream.flush()
@@ -0,0 +1,84 @@
+import os
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class Pairing(NamedTuple):
+    """
+    Result of pairing images and labels by their stem. pairs holds
+    (index, image path, label path) where index is the position of the stem
+    in the sorted list of all stems, orphans included, so the ids do not
+    shift when a file is missing. missing are the requested stems without
+    image and label. num_stems is the length of that list, the highest
+    index + 1 a pair could have.
+    """
+    pairs: List[Tuple[int, str, str]]
+    orphan_images: List[str]
+    orphan_labels: List[str]
+    missing: List[str]
+    num_stems: int
+
+    def report(self) -> dict:
+        return {
+            'pairs': len(self.pairs),
+            'orphan_images': self.orphan_images,
+            'orphan_labels': self.orphan_labels,
+            'missing': self.missing,
+        }
+
+    def summary(self) -> str:
+        return '{} pairs, {} images without labels, {} labels without ' \
+               'images, {} missing'.format(
+                   len(self.pairs), len(self.orphan_images),
+                   len(self.orphan_labels), len(self.missing))
+
+
+def scan_stems(path: str, extensions: Optional[Iterable[str]] = None) \
+        -> Dict[str, str]:
+    """
+    Lists the files of path in a single os.scandir pass.
+
+    :return: {stem: path}, only files with one of extensions if given
+    """
+    if extensions is not None:
+        extensions = set(extensions)
+    files = {}
+    with os.scandir(path) as it:
+        for entry in it:
+            stem, ext = os.path.splitext(entry.name)
+            if extensions is not None and ext not in extensions:
+                continue
+            if not entry.is_file():
+                continue
+            files[stem] = entry.path
+    return files
+
+
+def pair_by_stem(images: Dict[str, str], labels: Dict[str, str],
+                 stems: Optional[List[str]] = None) -> Pairing:
+    """
+    Pairs the {stem: path} indices of images and labels with dict lookups.
+    With stems only those are considered, in that order, otherwise the
+    image stems in sorted order.
+    """
+    if stems is None:
+        stems = sorted(images)
+        orphan_labels = [labels[s] for s in sorted(labels) if s not in images]
+    else:
+        orphan_labels = [labels[s] for s in stems
+                         if s in labels and s not in images]
+
+    pairs = []
+    orphan_images = []
+    missing = []
+    for index, stem in enumerate(stems):
+        image = images.get(stem)
+        label = labels.get(stem)
+        if image is None:
+            if label is None:
+                missing += [stem]
+        elif label is None:
+            orphan_images += [image]
+        else:
+            pairs += [(index, image, label)]
+    return Pairing(pairs, orphan_images, orphan_labels, missing, len(stems))
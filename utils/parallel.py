@@ -0,0 +1,26 @@
+import multiprocessing
+
+from typing import Callable, Iterable, Iterator, Optional
+
+
+def ordered_map(func: Callable, iterable: Iterable, workers: int = 1,
+                chunksize: int = 16, initializer: Optional[Callable] = None,
+                initargs: tuple = ()) -> Iterator:
+    """
+    Maps func over iterable and yields the results in input order.
+
+    With workers <= 1 everything runs in the calling process, otherwise the
+    calls are spread over a process pool. func and the elements of iterable
+    have to be picklable in that case. initializer is called with initargs
+    once per process before the first call of func.
+    """
+    if workers is None or workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for res in map(func, iterable):
+            yield res
+        return
+    with multiprocessing.Pool(processes=workers, initializer=initializer,
+                              initargs=initargs) as pool:
+        for res in pool.imap(func, iterable, chunksize=chunksize):
+            yield res
@@ -0,0 +1,244 @@
+import collections
+import functools
+import os
+
+from typing import List, Optional, Tuple
+
+from utils.boxes import BoxValidator
+from utils.imagesize import ImageSizeCache
+from utils.materialize import materialize_images, write_copies
+from utils.metrics import Metrics, Progress, activate, active, count, stage
+from utils.parallel import ordered_map
+from utils.prefetch import BackgroundWriter, Prefetcher, read_file
+from utils.readers import DatasetReader, ImageRecord
+from utils.sinks import Sink
+from utils.subset import Subset
+
+# reader and box validator of the worker processes and whether they collect
+# metrics, set by _init_worker
+_reader = None
+_validator = None
+_with_metrics = False
+
+
+def _init_worker(reader: DatasetReader, with_metrics: bool = False,
+                 validator: Optional[BoxValidator] = None):
+    global _reader, _with_metrics, _validator
+    _reader = reader
+    _with_metrics = with_metrics
+    _validator = validator
+
+
+def _convert(task) -> Tuple[Optional[ImageRecord], List[str],
+                            Optional[dict]]:
+    """
+    Parses an image/label pair and materializes the image for all sinks,
+    reading the source image at most once.
+    This is the per-image work which is distributed over the worker pool.
+
+    If the task carries the prefetched file contents, the targets which are
+    plain copies of the image are not written but returned.
+
+    :return: (record or None if the image is skipped, targets to write,
+        metrics of the task or None)
+    """
+    index, image_path, label_path, size, targets = task[:5]
+    label_data, image_data = task[5:] if len(task) > 5 else (None, None)
+    metrics = Metrics() if _with_metrics else None
+    previous = activate(metrics)
+    try:
+        record = _reader.read(index, image_path, label_path, size,
+                              label_data=label_data, image_data=image_data)
+        if _validator is not None:
+            with stage('validate'):
+                boxes, fixes = _validator(record.boxes, record.width,
+                                          record.height)
+                record = record._replace(boxes=boxes)
+            for name, n in fixes.items():
+                count(name, n)
+        if _reader.skip_empty and len(record.boxes) == 0:
+            return None, [], metrics and metrics.to_dict()
+        copies = []
+        with stage('materialize'):
+            # the targets are grouped by the source image of their modality
+            for source in sorted(set(target[0] for target in targets),
+                                 key=lambda path: path != image_path):
+                copies += materialize_images(
+                    source,
+                    [target[1:] for target in targets if target[0] == source],
+                    image_data if source == image_path else None)
+        return record, copies, metrics and metrics.to_dict()
+    finally:
+        activate(previous)
+
+
+def _prefetch(read_labels: bool, read_image: bool, task) -> tuple:
+    image_path, label_path = task[1:3]
+    with stage('prefetch'):
+        return task + (read_file(label_path) if read_labels else None,
+                       read_file(image_path) if read_image else None)
+
+
+def _prefetched_size(task) -> int:
+    return sum(len(data) for data in task[5:] if data is not None)
+
+
+def convert(reader: DatasetReader, sinks: List[Sink], workers: int = 1,
+            size_cache: Optional[ImageSizeCache] = None,
+            folds: Optional[List[str]] = None, prefetch: int = 0,
+            prefetch_memory: int = 256 << 20,
+            metrics: Optional[Metrics] = None,
+            validator: Optional[BoxValidator] = None,
+            subset: Optional[Subset] = None):
+    """
+    Converts all folds of reader with a single pass over the data, every
+    record is handed to all sinks, as the record of the sink's modality.
+
+    With metrics, the stage times and counters of the main process and the
+    workers are collected into it, see utils/metrics.py.
+
+    With subset, only the selected images of every fold are converted.
+
+    With validator, the boxes of every record are repaired or dropped by it
+    before they are handed to the sinks.
+
+    With prefetch > 0 the label files and the images which are copied or
+    transcoded are read ahead by that many threads of the main process,
+    holding at most about prefetch_memory bytes, and the plain copies are
+    written in the background. This hides the latency of network file
+    systems.
+
+    The sinks assign the ids from the positions in the fold listing and the
+    records in image order, see IdAllocator, so the output neither depends
+    on the number of workers nor on the images taken from a previous run.
+    """
+    if size_cache is None:
+        size_cache = ImageSizeCache()
+    if folds is None:
+        folds = reader.folds
+
+    previous = activate(metrics)
+    try:
+        for fold in folds:
+            print('Writing {}'.format(fold))
+            pairs = reader.list_pairs(fold)
+            # the ids are positions in the full listing, see IdAllocator
+            listing_size = reader.listing_size(fold)
+            if subset is not None:
+                num_listed = len(pairs)
+                pairs = subset.select(fold, reader.year, pairs)
+                print('Subset of {}: {} of {} images'.format(
+                    fold, len(pairs), num_listed))
+            for sink in sinks:
+                sink.begin_fold(fold, len(pairs), listing_size)
+            try:
+                _convert_fold(reader, fold, pairs, sinks, workers,
+                              size_cache, prefetch, prefetch_memory,
+                              validator)
+            except BaseException:
+                for sink in sinks:
+                    sink.abort()
+                raise
+            with stage('write'):
+                for sink in sinks:
+                    sink.end_fold()
+
+        for sink in sinks:
+            sink.close()
+        reader.close()
+        size_cache.save()
+    finally:
+        activate(previous)
+
+
+def _convert_fold(reader: DatasetReader, fold: str,
+                  pairs: List[Tuple[int, str, str]], sinks: List[Sink],
+                  workers: int, size_cache: ImageSizeCache,
+                  prefetch: int = 0, prefetch_memory: int = 256 << 20,
+                  validator: Optional[BoxValidator] = None):
+    tasks = []
+    unchanged = []
+    for index, image_path, label_path in pairs:
+        key = os.path.basename(image_path)
+        is_unchanged = all(
+            sink.is_unchanged(key, [sink.image_source(image_path),
+                                    label_path]) for sink in sinks)
+        unchanged += [is_unchanged]
+        if not is_unchanged:
+            tasks += [(index, image_path, label_path,
+                       size_cache.lookup(image_path),
+                       [(sink.image_source(image_path),
+                         sink.image_target(key), sink.materialize,
+                         sink.image_options) for sink in sinks])]
+
+    prefetcher = None
+    writer = None
+    # the prefetched tasks handed to the workers, in order
+    held = collections.deque()
+    if prefetch > 0:
+        # only the listed image is read ahead, not those of other modalities
+        read_image = any(sink.materialize in ['copy',
+                                              'transcode-only-if-needed'] and
+                         sink.modality == reader.modality for sink in sinks)
+        prefetcher = Prefetcher(
+            functools.partial(_prefetch, reader.prefetch_labels, read_image),
+            tasks, in_flight=prefetch, memory_budget=prefetch_memory,
+            size=_prefetched_size)
+        writer = BackgroundWriter(workers=prefetch)
+
+        def hold(it):
+            for task in it:
+                held.append(task)
+                yield task
+        tasks = hold(prefetcher)
+
+    def release(task, copies):
+        try:
+            with stage('materialize'):
+                write_copies(task[6], copies)
+        finally:
+            prefetcher.done(task)
+
+    metrics = active()
+    # the pool takes the tasks in chunks, which must not wait for the
+    # prefetcher to free memory
+    results = ordered_map(_convert, tasks, workers=workers,
+                          chunksize=1 if prefetcher is not None else 16,
+                          initializer=_init_worker,
+                          initargs=(reader, metrics is not None,
+                                    validator))
+    progress = Progress(fold, len(pairs))
+    try:
+        for i, ((index, image_path, label_path), is_unchanged) in \
+                enumerate(zip(pairs, unchanged)):
+            progress.update(i)
+            if is_unchanged:
+                key = os.path.basename(image_path)
+                with stage('write'):
+                    for sink in sinks:
+                        sink.reuse(index, key, [sink.image_source(image_path),
+                                                label_path])
+                count('reused')
+                continue
+
+            record, copies, task_metrics = next(results)
+            if task_metrics is not None:
+                metrics.merge(task_metrics)
+            task = held.popleft() if prefetcher is not None else None
+            if record is None:
+                if task is not None:
+                    prefetcher.done(task)
+                count('skipped')
+                continue
+            if task is not None:
+                writer.submit(release, task, copies)
+            size_cache.store(image_path, (record.width, record.height))
+            with stage('write'):
+                for sink in sinks:
+                    sink.write(record.for_modality(sink.modality))
+            count('images')
+            count('boxes', len(record.boxes))
+        progress.update(len(pairs))
+    finally:
+        if writer is not None:
+            writer.close()
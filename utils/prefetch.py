@@ -0,0 +1,129 @@
+import collections
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from typing import Callable, Iterable, Iterator, Optional
+
+
+def read_file(path: Optional[str]) -> Optional[bytes]:
+    if path is None:
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class Prefetcher(object):
+    """
+    Maps func over items with a thread pool ahead of the consumer and
+    yields the results in input order, meant for reads from file systems
+    with a high latency. At most in_flight calls are pending and new calls
+    are only started while the results which were not released yet take
+    less than memory_budget bytes, as measured by size. A result is
+    released with done(), a single result larger than the budget is still
+    read once nothing else is held.
+
+    Iterating the prefetcher and calling done() may happen in different
+    threads.
+    """
+
+    def __init__(self, func: Callable, items: Iterable, in_flight: int = 8,
+                 memory_budget: int = 256 << 20,
+                 size: Callable = len):
+        self.func = func
+        self.items = iter(items)
+        self.in_flight = max(1, in_flight)
+        self.memory_budget = memory_budget
+        self.size = size
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def _run(self, item):
+        res = self.func(item)
+        nbytes = self.size(res)
+        with self.condition:
+            self.used += nbytes
+        return res
+
+    def _has_budget(self) -> bool:
+        return self.used == 0 or self.used < self.memory_budget
+
+    def done(self, res):
+        """
+        Releases the memory of a result.
+        """
+        with self.condition:
+            self.used -= self.size(res)
+            self.condition.notify_all()
+
+    def __iter__(self) -> Iterator:
+        pending = collections.deque()
+        with ThreadPoolExecutor(max_workers=self.in_flight,
+                                thread_name_prefix='prefetch') as executor:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < self.in_flight:
+                    with self.condition:
+                        # wait for the consumer unless there is a result
+                        # to hand out
+                        while not self._has_budget() and \
+                                not (pending and pending[0].done()):
+                            self.condition.wait(0.05)
+                        if not self._has_budget():
+                            break
+                    try:
+                        item = next(self.items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.append(executor.submit(self._run, item))
+                if not pending:
+                    return
+                yield pending.popleft().result()
+
+
+class BackgroundWriter(object):
+    """
+    Runs write calls on a thread pool with at most max_pending calls in
+    flight, so the caller only blocks once the writes fall behind.
+    close() waits for all pending writes and raises the first error.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 64,
+                 name: str = 'writer'):
+        # named threads are easier to tell apart in py-spy dumps
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix=name)
+        self.pending = threading.BoundedSemaphore(max_pending)
+        self.futures = []
+
+    def _call(self, func: Callable, args: tuple):
+        try:
+            return func(*args)
+        finally:
+            self.pending.release()
+
+    def submit(self, func: Callable, *args) -> Future:
+        self.pending.acquire()
+        future = self.executor.submit(self._call, func, args)
+        self.futures += [future]
+        # drop the finished writes, errors are raised on close
+        if len(self.futures) > 1024:
+            self._check(wait=False)
+        return future
+
+    def _check(self, wait: bool):
+        futures, self.futures = self.futures, []
+        for future in futures:
+            if wait or future.done():
+                future.result()
+            else:
+                self.futures += [future]
+
+    def close(self):
+        if self.executor is None:
+            return
+        try:
+            self._check(wait=True)
+        finally:
+            self.executor.shutdown(wait=True)
+            self.executor = None
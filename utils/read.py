@@ -1,7 +1,14 @@
 import itertools
 import os
 
-from typing import List
+import yaml
+from typing import List, Optional
+
+try:
+    # libyaml bindings, a lot faster than the pure python loader
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
 
 
 def get_files_in_set(root: str, file_names:  List[str]) -> List[str]:
@@ -9,4 +16,11 @@ def get_files_in_set(root: str, file_names:  List[str]) -> List[str]:
                      file_names]
     files_in_sets = list(itertools.chain(*files_in_sets))
     files_in_sets = [l[:-1] for l in files_in_sets]
-    return files_in_sets
\ No newline at end of file
+    return files_in_sets
+
+
+def load_yaml(path: str, data: Optional[bytes] = None):
+    if data is not None:
+        return yaml.load(data, Loader=YamlLoader)
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=YamlLoader)
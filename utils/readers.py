@@ -0,0 +1,464 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from utils.annotation_cache import AnnotationCache
+from utils.boxes import BoxArray
+from utils.categories import CategoryRegistry
+from utils.imagesize import get_image_size
+from utils.jsonstream import JsonStream
+from utils.metrics import count, stage
+from utils.pairing import Pairing, pair_by_stem, scan_stems
+from utils.read import get_files_in_set
+
+DEEPDRIVE_FOLDS = ['train', 'val', 'test']
+DEEPDRIVE_VERSIONS = ['100k', '10k']
+DEEPDRIVE_LABELS = ['bus', 'traffic light', 'traffic sign', 'person', 'bike', 'truck', 'motor', 'car', 'train', 'rider']
+
+INOUTDOOR_LABELS = ['person']
+INOUTDOOR_MODALITIES = {
+    'rgb': 'ImagesQhd',
+    'depth': 'DepthJetQhd',
+}
+# modalities which stand for several exported ones
+INOUTDOOR_MODALITY_GROUPS = {
+    'rgbd': ['rgb', 'depth'],
+}
+
+
+class ImageRecord(NamedTuple):
+    """
+    An image with its boxes as produced by a dataset reader. The boxes are
+    in pixel coordinates of the image, their labels are the category ids.
+
+    If the reader exports several modalities, the record is the one of the
+    first and modalities holds {modality: (image path, width, height)} of
+    all, see for_modality.
+    """
+    index: int
+    key: str
+    image_path: str
+    label_path: str
+    width: int
+    height: int
+    boxes: BoxArray
+    modalities: Optional[Dict[str, Tuple[str, int, int]]] = None
+
+    def for_modality(self, modality: Optional[str]) -> 'ImageRecord':
+        """
+        :return: the record of the image of another modality, with the
+            boxes scaled to its size
+        """
+        if self.modalities is None or modality not in self.modalities:
+            return self
+        image_path, width, height = self.modalities[modality]
+        boxes = self.boxes
+        if (width, height) != (self.width, self.height):
+            boxes = boxes.normalize(
+                BoxArray.Normalizer(self.width, self.height)) \
+                .rescale(width, height)
+        return self._replace(image_path=image_path, width=width,
+                             height=height, boxes=boxes)
+
+
+class DatasetReader(object):
+    """
+    Lists the image/label pairs of a dataset and parses them into
+    ImageRecords. Readers are handed to the worker processes, so they
+    should only hold picklable state.
+
+    name: prefix of the exported folders and files
+    modality: sub folder of the export, None if there is only one
+    modalities: the exported modalities, which share the labels and
+        pairing of the first one, see modality_path
+    image_extension: extension of the exported images, None to keep the
+        one of the source image
+    labels: the category names of the dataset
+    categories: the CategoryRegistry mapping them to the exported categories
+    skip_empty: whether images without boxes are left out of the export
+    prefetch_labels: whether the label files are read ahead and passed to
+        read() as label_data when prefetching is enabled
+    pairings: the Pairing of every listed fold, with the orphaned files
+    """
+    name = None
+    folds = []
+    year = None
+    labels = []
+    info = {}
+    licenses = []
+    modality = None
+    modalities = [None]
+    image_extension = None
+    skip_empty = False
+    default_materialize = 'copy'
+    prefetch_labels = True
+    pairings = None
+    categories = None
+
+    def _init_categories(self, categories: Optional[CategoryRegistry]):
+        self.categories = categories or CategoryRegistry(self.labels)
+
+    def _paired(self, fold: str, pairing: Pairing) \
+            -> List[Tuple[int, str, str]]:
+        if self.pairings is None:
+            self.pairings = {}
+        self.pairings[fold] = pairing
+        count('orphaned', len(pairing.orphan_images) +
+              len(pairing.orphan_labels) + len(pairing.missing))
+        if pairing.orphan_images or pairing.orphan_labels or pairing.missing:
+            print('Unpaired files in {}: {}'.format(fold, pairing.summary()))
+        return pairing.pairs
+
+    def list_pairs(self, fold: str) -> List[Tuple[int, str, str]]:
+        """
+        :return: [(index, image path, label path), ...], the index is the
+            position in the listing, see IdAllocator
+        """
+        raise NotImplementedError()
+
+    def listing_size(self, fold: str) -> int:
+        """
+        :return: the length of the listing of the listed fold, images
+            without labels included
+        """
+        return self.pairings[fold].num_stems
+
+    def read(self, index: int, image_path: str, label_path: str,
+             size: Optional[Tuple[int, int]] = None,
+             label_data: Optional[bytes] = None,
+             image_data: Optional[bytes] = None) -> ImageRecord:
+        """
+        Parses the labels of an image. The dimensions are read from the
+        image header, unless size is given. label_data and image_data are
+        the contents of the files if they were read ahead already.
+        """
+        raise NotImplementedError()
+
+    def image_name(self, key: str) -> str:
+        """
+        :return: the file name of the exported image of the source image key
+        """
+        if self.image_extension is None:
+            return key
+        return '{}{}'.format(os.path.splitext(key)[0], self.image_extension)
+
+    def group(self, key: str) -> Optional[str]:
+        """
+        :return: the group of a listed image, e.g. its sequence, for a
+            stratified subset, None if the dataset has none
+        """
+        return None
+
+    def modality_path(self, image_path: str, modality: Optional[str]) -> str:
+        """
+        :return: the path of the image of modality which shows the same as
+            the listed image_path
+        """
+        return image_path
+
+    def close(self):
+        pass
+
+
+class BDD100KReader(DatasetReader):
+    """
+    Reads the per frame json labels of BDD100K, or with consolidated set the
+    bdd100k_labels_images_{fold}.json files which hold the labels of a whole
+    fold. Those are streamed once per fold and the boxes of every image are
+    kept as BoxArray, keyed by the image name.
+    """
+    name = 'deepdrive'
+    folds = ['train', 'val']
+    year = 2017
+    labels = DEEPDRIVE_LABELS
+    info = {
+        'description': '',
+        'url': 'deepdrive.org',
+        'version': 'v1.0',
+        'year': 2018,
+        'contributor': 'Berkeley',
+        'date_created': '2019-01-01 09:00:00.00000'
+    }
+    licenses = [
+        {
+            'url': '',
+            'id': 1,
+            'name': 'COCO'
+        }
+    ]
+    image_extension = '.jpg'
+    default_materialize = 'transcode-only-if-needed'
+
+    def __init__(self, dataset_path: Optional[str] = None,
+                 version: str = '100k', consolidated: bool = False,
+                 categories: Optional[CategoryRegistry] = None):
+        if dataset_path is None:
+            dataset_path = os.path.expanduser(os.path.join('~', '.deepdrive', ))
+        required_paths = ['images', 'labels']
+
+        # validate that he paths are available
+        for p in required_paths:
+            assert(os.path.exists(os.path.join(dataset_path, p)))
+
+        self.image_path = os.path.join(
+            dataset_path, 'images', 'bdd100k/images/{}/'.format(version))
+        self.label_path = os.path.join(
+            dataset_path, 'labels', 'bdd100k/labels/{}/'.format(version))
+        self.consolidated_path = os.path.join(
+            dataset_path, 'labels', 'bdd100k/labels/')
+        self._init_categories(categories)
+        self.consolidated = consolidated
+        # all images share the consolidated file
+        self.prefetch_labels = not consolidated
+        self.boxes_by_name = None
+
+    def _boxes(self, objects: list) -> BoxArray:
+        objects = [tmp for tmp in objects if 'box2d' in tmp]
+        label = self.categories.map([tmp['category'] for tmp in objects])
+        boxes = BoxArray.from_lists(
+            xmin=[tmp['box2d']['x1'] for tmp in objects],
+            xmax=[tmp['box2d']['x2'] for tmp in objects],
+            ymin=[tmp['box2d']['y1'] for tmp in objects],
+            ymax=[tmp['box2d']['y2'] for tmp in objects],
+            label=label
+        )
+        return boxes if label.all() else boxes[label > 0]
+
+    def _list_consolidated(self, fold: str) -> List[Tuple[int, str, str]]:
+        labels_file = os.path.join(
+            self.consolidated_path,
+            'bdd100k_labels_images_{}.json'.format(fold))
+        self.boxes_by_name = {}
+        labels = {}
+        with stage('read_label'), open(labels_file, 'r') as f:
+            for frame in JsonStream(f).array():
+                self.boxes_by_name[frame['name']] = self._boxes(
+                    frame.get('labels') or [])
+                labels[os.path.splitext(frame['name'])[0]] = labels_file
+
+        with stage('list'):
+            images = scan_stems(os.path.join(self.image_path, fold))
+        with stage('pair'):
+            pairing = pair_by_stem(images, labels)
+        return self._paired(fold, pairing)
+
+    def list_pairs(self, fold: str) -> List[Tuple[int, str, str]]:
+        if self.consolidated:
+            return self._list_consolidated(fold)
+
+        with stage('list'):
+            images = scan_stems(os.path.join(self.image_path, fold))
+            labels = scan_stems(os.path.join(self.label_path, fold),
+                                ['.json'])
+        with stage('pair'):
+            pairing = pair_by_stem(images, labels)
+        return self._paired(fold, pairing)
+
+    def read(self, index: int, image_path: str, label_path: str,
+             size: Optional[Tuple[int, int]] = None,
+             label_data: Optional[bytes] = None,
+             image_data: Optional[bytes] = None) -> ImageRecord:
+        if size is None:
+            with stage('probe'):
+                size = get_image_size(image_path, image_data)
+        width, height = size
+
+        if self.boxes_by_name is not None:
+            boxes = self.boxes_by_name[os.path.basename(image_path)]
+        else:
+            if label_data is None:
+                with stage('read_label'), open(label_path, 'r') as f:
+                    label_data = f.read()
+            with stage('parse'):
+                obj = json.loads(label_data)
+                boxes = self._boxes(obj['frames'][0]['objects'])
+        return ImageRecord(index, os.path.basename(image_path), image_path,
+                           label_path, width, height, boxes)
+
+
+class InOutDoorReader(DatasetReader):
+    """
+    Reads the yaml annotations of the InOutDoor people dataset. Images
+    without any person are skipped.
+
+    modality is one of INOUTDOOR_MODALITIES or INOUTDOOR_MODALITY_GROUPS,
+    or a list of those. With several modalities every annotation is parsed
+    once, the image sizes of all modalities are probed concurrently and
+    only stems with an image in every modality are paired.
+    """
+    name = 'inoutdoor'
+    folds = ['train', 'test']
+    year = 2015
+    labels = INOUTDOOR_LABELS
+    info = {
+        'description': '',
+        'url': 'ais.informatik.uni-freiburg.derg',
+        'version': 'v1.0',
+        'year': 2015,
+        'contributor': 'University of Freiburg',
+        'date_created': '2019-01-01 09:00:00.00000'
+    }
+    licenses = [
+        {
+            'url': '',
+            'id': 1,
+            'name': 'CC'
+        }
+    ]
+    skip_empty = True
+    # the boxes are annotated for this image size
+    annotation_size = (1920, 1080)
+    sequences = {
+        'train': ['seq0.txt', 'seq1.txt', 'seq2.txt'],
+        'test': ['seq3.txt']
+    }
+
+    def __init__(self, dataset_path: Optional[str] = None,
+                 modality: Union[str, List[str]] = 'rgb',
+                 annotation_cache: Optional[str] = None,
+                 categories: Optional[CategoryRegistry] = None):
+        if dataset_path is None:
+            dataset_path = os.path.expanduser(os.path.join('~', 'dataset', 'inoutdoorpeoplergbd' ))
+        required_paths = ['Annotations', 'ImageSets', 'ImagesQhd', 'DepthJetQhd']
+
+        # validate that he paths are available
+        for p in required_paths:
+            assert(os.path.exists(os.path.join(dataset_path, p)))
+
+        self._init_categories(categories)
+        modalities = [modality] if isinstance(modality, str) else modality
+        self.modalities = []
+        for name in modalities:
+            for m in INOUTDOOR_MODALITY_GROUPS.get(name, [name]):
+                if m not in INOUTDOOR_MODALITIES:
+                    raise ValueError('Unknown modality: {}'.format(m))
+                if m not in self.modalities:
+                    self.modalities += [m]
+        self.modality = self.modalities[0]
+        self.dataset_path = dataset_path
+        self.image_path = os.path.join(
+            dataset_path, INOUTDOOR_MODALITIES[self.modality])
+        self.label_path = os.path.join(dataset_path, 'Annotations')
+        self.imageset_path = os.path.join(dataset_path, 'ImageSets')
+        self.annotation_cache = AnnotationCache(annotation_cache,
+                                                root=self.label_path)
+        # cached annotations are not read again
+        self.prefetch_labels = annotation_cache is None
+        # probes the images of the other modalities, created per process
+        self._probe_pool = None
+        # {stem: sequence} of the listed folds
+        self.sequence_of = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_probe_pool'] = None
+        return state
+
+    def group(self, key: str) -> Optional[str]:
+        return self.sequence_of.get(os.path.splitext(key)[0])
+
+    def modality_path(self, image_path: str, modality: Optional[str]) -> str:
+        if modality is None or modality == self.modality:
+            return image_path
+        return os.path.join(self.dataset_path, INOUTDOOR_MODALITIES[modality],
+                            os.path.basename(image_path))
+
+    def list_pairs(self, fold: str) -> List[Tuple[int, str, str]]:
+        with stage('list'):
+            files_in_sets = []
+            for sequence in self.sequences[fold]:
+                files = get_files_in_set(self.imageset_path, [sequence])
+                self.sequence_of.update(
+                    (stem, os.path.splitext(sequence)[0]) for stem in files)
+                files_in_sets += files
+            images = scan_stems(self.image_path, ['.png'])
+            for modality in self.modalities[1:]:
+                others = scan_stems(os.path.join(
+                    self.dataset_path, INOUTDOOR_MODALITIES[modality]),
+                    ['.png'])
+                # the labels of those become orphans
+                missing = [stem for stem in images if stem not in others]
+                if missing:
+                    count('missing_{}'.format(modality), len(missing))
+                for stem in missing:
+                    del images[stem]
+            labels = scan_stems(self.label_path, ['.yml'])
+        with stage('pair'):
+            pairing = pair_by_stem(images, labels, sorted(files_in_sets))
+        return self._paired(fold, pairing)
+
+    def read(self, index: int, image_path: str, label_path: str,
+             size: Optional[Tuple[int, int]] = None,
+             label_data: Optional[bytes] = None,
+             image_data: Optional[bytes] = None) -> ImageRecord:
+        modalities = None
+        if len(self.modalities) > 1:
+            with stage('probe'):
+                size, modalities = self._probe_modalities(
+                    image_path, size, image_data)
+        elif size is None:
+            with stage('probe'):
+                size = get_image_size(image_path, image_data)
+        width, height = size
+
+        obj = self.annotation_cache.load(label_path, label_data)
+
+        with stage('parse'):
+            boxes = self._boxes(obj, width, height)
+        return ImageRecord(index, os.path.basename(image_path), image_path,
+                           label_path, width, height, boxes, modalities)
+
+    def _probe_modalities(self, image_path: str,
+                          size: Optional[Tuple[int, int]],
+                          image_data: Optional[bytes]) \
+            -> Tuple[Tuple[int, int], Dict[str, Tuple[str, int, int]]]:
+        """
+        Reads the sizes of the images of all modalities in parallel, the
+        size of the listed image is only read if it is not given.
+        """
+        if self._probe_pool is None:
+            self._probe_pool = ThreadPoolExecutor(
+                max_workers=len(self.modalities),
+                thread_name_prefix='probe')
+        paths = [self.modality_path(image_path, m) for m in self.modalities]
+        futures = [self._probe_pool.submit(get_image_size, path)
+                   for path in paths[1:]]
+        if size is None:
+            size = get_image_size(image_path, image_data)
+        sizes = [size] + [future.result() for future in futures]
+        return size, {m: (path, w, h) for m, path, (w, h) in
+                      zip(self.modalities, paths, sizes)}
+
+    def _boxes(self, obj: dict, width: int, height: int) -> BoxArray:
+        objects = [tmp for tmp in obj['annotation'].get('object', [])
+                   if 'bndbox' in tmp]
+        label = self.categories.map([tmp['name'] for tmp in objects])
+        boxes = BoxArray.from_lists(
+            xmin=[int(tmp['bndbox']['xmin']) for tmp in objects],
+            xmax=[int(tmp['bndbox']['xmax']) for tmp in objects],
+            ymin=[int(tmp['bndbox']['ymin']) for tmp in objects],
+            ymax=[int(tmp['bndbox']['ymax']) for tmp in objects],
+            label=label
+        )
+        if not label.all():
+            boxes = boxes[label > 0]
+        # we rescale them to the actual image size used
+        return boxes.normalize(BoxArray.Normalizer(*self.annotation_size)) \
+            .rescale(width, height)
+
+    def compile_annotations(self):
+        """
+        Parses all annotation files which are not cached yet and saves the
+        cache. The entries parsed in worker processes are not written back,
+        so the cache is compiled before they are started.
+        """
+        self.annotation_cache.compile(self.label_path)
+        self.annotation_cache.save()
+
+    def close(self):
+        self.annotation_cache.save()
+        if self._probe_pool is not None:
+            self._probe_pool.shutdown()
+            self._probe_pool = None
@@ -0,0 +1,353 @@
+import array
+import os
+import re
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from typing import List, Optional, Tuple
+
+from utils.boxes import BoxArray
+from utils.coco import CocoWriter
+from utils.coco_binary import CocoBinary
+from utils.fs import mkdir_p
+from utils.ids import IdAllocator
+from utils.imagesize import get_image_size
+from utils.jsonstream import JsonStream
+from utils.materialize import materialize_image
+from utils.yolo import YoloLabelWriter, format_yolo_lines, parse_yolo_lines
+
+COCO_FILE_NAME = re.compile(r'^instances_(\D+)(\d*)\.json$')
+
+
+def parse_coco_file_name(path: str) -> Tuple[str, str]:
+    """
+    :return: (fold, year) of an instances_{fold}{year}.json file
+    """
+    match = COCO_FILE_NAME.match(os.path.basename(path))
+    if match is None:
+        raise ValueError('Expected an instances_{{fold}}{{year}}.json file, '
+                         'got {}'.format(path))
+    return match.group(1), match.group(2)
+
+
+class CocoColumns(object):
+    """
+    The parts of a COCO annotation file which the darknet labels are made
+    of, as arrays: the images in file order and the annotations with the
+    position of their image and category. The file is streamed, the
+    annotations are collected in compact arrays. If the file was exported
+    with a binary cache (convert.py --coco-binary) which is not older than
+    the file, the arrays are taken from the cache instead.
+
+    With images_only the file is only read up to the images.
+    """
+
+    def __init__(self, path: str, images_only: bool = False):
+        self.info = {}
+        self.licenses = []
+        self.images = []
+        self.categories = []
+        cache = '{}.cache'.format(os.path.splitext(path)[0])
+        if os.path.isdir(cache) and \
+                os.path.getmtime(cache) >= os.path.getmtime(path):
+            self._load_binary(cache)
+        else:
+            self._load_json(path, images_only)
+
+    def _load_binary(self, cache: str):
+        binary = CocoBinary(cache)
+        self.info = binary.info
+        self.licenses = binary.licenses
+        self.categories = binary.categories
+        self.images = [binary.image(i) for i in range(len(binary))]
+        self._index(binary.images['id'], binary.images['width'],
+                    binary.images['height'], binary.image_id,
+                    binary.category_id, np.asarray(binary.bbox))
+
+    def _load_json(self, path: str, images_only: bool = False):
+        image_ids = array.array('q')
+        ann_image_ids = array.array('q')
+        ann_category_ids = array.array('q')
+        bbox = array.array('d')
+
+        with open(path, 'r') as f:
+            stream = JsonStream(f)
+            for key in stream.items():
+                if key == 'images':
+                    for obj_im in stream.array():
+                        self.images += [obj_im]
+                        image_ids.append(obj_im['id'])
+                    if images_only:
+                        break
+                elif key == 'annotations':
+                    for obj_ann in stream.array():
+                        ann_image_ids.append(obj_ann['image_id'])
+                        ann_category_ids.append(obj_ann['category_id'])
+                        bbox.extend(obj_ann['bbox'])
+                elif key in ['info', 'licenses', 'categories']:
+                    setattr(self, key, stream.value())
+                else:
+                    stream.value()
+
+        self._index(np.frombuffer(image_ids, np.int64),
+                    [obj_im['width'] for obj_im in self.images],
+                    [obj_im['height'] for obj_im in self.images],
+                    np.frombuffer(ann_image_ids, np.int64),
+                    np.frombuffer(ann_category_ids, np.int64),
+                    np.frombuffer(bbox, dtype=np.float64).reshape(-1, 4))
+
+    def _index(self, image_ids, width, height, ann_image_ids,
+               ann_category_ids, bbox: np.ndarray):
+        self.width = np.asarray(width, dtype=np.float64)
+        self.height = np.asarray(height, dtype=np.float64)
+        self.bbox = bbox
+        self.image_index = _positions(np.asarray(image_ids), ann_image_ids)
+        self.category_index = _positions(
+            np.array([c['id'] for c in self.categories], dtype=np.int64),
+            ann_category_ids)
+
+
+def _positions(ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    :return: the position of every value in ids
+    """
+    sorter = np.argsort(ids, kind='stable')
+    res = np.searchsorted(ids, values, sorter=sorter)
+    if len(values) and (res.max() >= len(ids) or
+                        (ids[sorter[res]] != values).any()):
+        raise ValueError('Annotations of unknown images or categories')
+    return sorter[res]
+
+
+def _yolo_file_name(name: str, fold: str, year: str, file_name: str) -> str:
+    # as YoloSink._file_name
+    return '{}_{}{}_{}'.format(name, fold, year, file_name)
+
+
+def coco_to_yolo(coco_files: List[str], output_path: str, name: str,
+                 modality: Optional[str] = None,
+                 images_path: Optional[str] = None,
+                 materialize: str = 'symlink',
+                 label_archive: bool = False):
+    """
+    Writes the darknet layout of YoloSink from COCO annotation files
+    without reading the images: the boxes are normalized by the image
+    dimensions stored in the COCO file. The images are materialized from
+    images_path/{fold}{year}, by default the folder next to annotations/.
+    """
+    prefix = os.path.join(output_path, modality or '')
+    data_folder = os.path.join(output_path, 'data', modality or '')
+    mkdir_p(data_folder)
+    folds = []
+    categories = None
+
+    for coco_file in coco_files:
+        fold, year = parse_coco_file_name(coco_file)
+        print('Writing {}'.format(fold))
+        coco = CocoColumns(coco_file)
+        if categories is not None and categories != coco.categories:
+            raise ValueError('The categories of {} differ'.format(coco_file))
+        categories = coco.categories
+
+        # normalized cx, cy, w, h as BoxArray.to_xcycwh
+        width = coco.width[coco.image_index]
+        height = coco.height[coco.image_index]
+        xmin, w = coco.bbox[:, 0] / width, coco.bbox[:, 2] / width
+        ymin, h = coco.bbox[:, 1] / height, coco.bbox[:, 3] / height
+        xcycwh = np.stack([xmin + w / 2, ymin + h / 2, w, h], axis=1)
+        order = np.argsort(coco.image_index, kind='stable')
+        offsets = np.zeros(len(coco.images) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(coco.image_index, minlength=len(coco.images)),
+                  out=offsets[1:])
+
+        source_folder = os.path.join(
+            images_path or os.path.join(os.path.dirname(
+                os.path.abspath(coco_file)), os.pardir),
+            '{}{}'.format(fold, year))
+        images_folder = os.path.abspath(os.path.join(
+            prefix, 'images', '{}{}'.format(fold, year)))
+        labels_folder = os.path.join(prefix, 'labels',
+                                     '{}{}'.format(fold, year))
+        mkdir_p(images_folder)
+        mkdir_p(labels_folder)
+        fold_list = os.path.join(data_folder, '{}_{}{}.txt'.format(
+            name, fold, year))
+        writer = YoloLabelWriter(labels_folder, archive=label_archive)
+        try:
+            with open(fold_list, 'w') as f:
+                for i, obj_im in enumerate(coco.images):
+                    file_name = _yolo_file_name(name, fold, year,
+                                                obj_im['file_name'])
+                    target = os.path.join(images_folder, file_name)
+                    materialize_image(
+                        os.path.join(source_folder, obj_im['file_name']),
+                        target, materialize)
+                    f.write('{}\n'.format(target))
+                    r = order[offsets[i]:offsets[i + 1]]
+                    writer.write(
+                        '{}.txt'.format(os.path.splitext(file_name)[0]),
+                        format_yolo_lines(coco.category_index[r], xcycwh[r]))
+        finally:
+            writer.close()
+        folds += [(fold, fold_list)]
+
+    names_file = os.path.join(data_folder, '{}.names'.format(name))
+    with open(os.path.join(data_folder, '{}.data'.format(name)), 'w') as f:
+        f.write('classes={}\n'.format(len(categories or [])))
+        for fold, fold_list in folds:
+            f.write('{}={}\n'.format('train' if fold == 'train' else 'valid',
+                                     os.path.abspath(fold_list)))
+        f.write('names={}\n'.format(os.path.relpath(names_file, output_path)))
+        f.write('backup=backup/\n')
+        f.write('eval={}\n'.format(name))
+    with open(names_file, 'w') as f:
+        for category in categories or []:
+            f.write('{}\n'.format(category['name']))
+
+
+class _DarknetLabels(object):
+    """
+    Reads the darknet label files of an images folder one at a time, from
+    the label folder or, if the labels are archived, in one sequential pass
+    over its tar archive. The archive is written in image order, members
+    which are passed over are remembered and read when they are asked for.
+    """
+
+    def __init__(self, images_folder: str):
+        self.labels_folder = os.path.join(
+            os.path.dirname(images_folder), os.pardir, 'labels',
+            os.path.basename(images_folder))
+        self.archive = None
+        self.members = None
+        self.skipped = {}
+        archive_file = '{}.tar'.format(self.labels_folder)
+        # the folder is empty if the labels are archived
+        if os.path.exists(archive_file) and not self._has_files():
+            self.archive = tarfile.open(archive_file, 'r')
+            self.members = iter(self.archive)
+
+    def _has_files(self) -> bool:
+        if not os.path.isdir(self.labels_folder):
+            return False
+        with os.scandir(self.labels_folder) as it:
+            return any(entry.name.endswith('.txt') for entry in it)
+
+    def read(self, image_path: str) -> str:
+        """
+        :return: the content of the label file of the image, '' if there
+            is none
+        """
+        file_name = '{}.txt'.format(
+            os.path.splitext(os.path.basename(image_path))[0])
+        if self.archive is None:
+            try:
+                with open(os.path.join(self.labels_folder, file_name),
+                          'r') as f:
+                    return f.read()
+            except FileNotFoundError:
+                return ''
+
+        member = self.skipped.pop(file_name, None)
+        while member is None:
+            member = next(self.members, None)
+            if member is None:
+                return ''
+            if not member.isfile():
+                member = None
+            elif member.name != file_name:
+                self.skipped[member.name] = member
+                member = None
+        return self.archive.extractfile(member).read().decode('utf-8')
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+
+def yolo_to_coco(names_file: str, fold_lists: List[str], output_path: str,
+                 references: Optional[List[str]] = None,
+                 id_scheme: str = 'sequential', workers: int = 8):
+    """
+    Writes instances_{fold}{year}.json for the darknet fold lists
+    {name}_{fold}{year}.txt. The image dimensions are taken from the
+    reference COCO files if they list the image, otherwise they are read
+    from the image headers with workers threads. With references the
+    image entries, info and licenses of those are kept, every fold list is
+    matched with the reference instances_{fold}{year}.json of its fold.
+    """
+    name = os.path.splitext(os.path.basename(names_file))[0]
+    with open(names_file, 'r') as f:
+        categories = [{'id': i + 1, 'name': line.rstrip('\n')}
+                      for i, line in enumerate(f) if line.strip()]
+    info, licenses = {}, []
+    # {(fold, year): {file name: image entry}}
+    reference_images = {}
+    for reference in references or []:
+        coco = CocoColumns(reference, images_only=True)
+        info, licenses = coco.info, coco.licenses
+        reference_images[parse_coco_file_name(reference)] = {
+            obj_im['file_name']: obj_im for obj_im in coco.images}
+
+    annotations_folder = os.path.join(output_path, 'annotations')
+    mkdir_p(annotations_folder)
+    ids = IdAllocator(id_scheme)
+    pattern = re.compile(r'^{}_(\D+)(\d*)\.txt$'.format(re.escape(name)))
+    for fold_list in fold_lists:
+        match = pattern.match(os.path.basename(fold_list))
+        if match is None:
+            raise ValueError('Expected a {}_{{fold}}{{year}}.txt list, got '
+                             '{}'.format(name, fold_list))
+        fold, year = match.groups()
+        print('Writing {}'.format(fold))
+        fold_images = reference_images.get((fold, year), {})
+        with open(fold_list, 'r') as f:
+            images = [line.rstrip('\n') for line in f if line.strip()]
+        ids.begin_fold(fold, len(images))
+        prefix = '{}_{}{}_'.format(name, fold, year)
+        file_names = [os.path.basename(p)[len(prefix):]
+                      if os.path.basename(p).startswith(prefix)
+                      else os.path.basename(p) for p in images]
+
+        unknown = [p for p, n in zip(images, file_names)
+                   if n not in fold_images]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sizes = dict(zip(unknown, executor.map(get_image_size, unknown)))
+
+        output_file = os.path.join(annotations_folder,
+                                   'instances_{}{}.json'.format(fold, year))
+        # {images folder: labels}, opened on first use
+        labels = {}
+        try:
+            with CocoWriter(output_file, info, licenses, categories) as writer:
+                for index, (path, file_name) in enumerate(zip(images,
+                                                              file_names)):
+                    if file_name in fold_images:
+                        obj_im = dict(fold_images[file_name])
+                    else:
+                        width, height = sizes[path]
+                        obj_im = {'file_name': file_name, 'height': height,
+                                  'width': width}
+                    image_id = ids.image_id(index, file_name)
+                    obj_im['id'] = image_id
+
+                    folder = os.path.dirname(path)
+                    if folder not in labels:
+                        labels[folder] = _DarknetLabels(folder)
+                    content = labels[folder].read(path)
+                    classes, xcycwh = parse_yolo_lines(content)
+                    xmin = xcycwh[:, 0] - xcycwh[:, 2] / 2
+                    ymin = xcycwh[:, 1] - xcycwh[:, 3] / 2
+                    boxes = BoxArray.from_lists(
+                        xmin=xmin, xmax=xmin + xcycwh[:, 2],
+                        ymin=ymin, ymax=ymin + xcycwh[:, 3],
+                        label=classes + 1).rescale(obj_im['width'],
+                                                   obj_im['height'])
+                    writer.add_annotations(
+                        image_id, boxes,
+                        ids.annotation_ids(image_id, len(boxes)))
+                    writer.add_image(obj_im)
+        finally:
+            for folder_labels in labels.values():
+                folder_labels.close()
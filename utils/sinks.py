@@ -0,0 +1,524 @@
+import os
+from datetime import datetime
+
+import numpy as np
+
+from typing import List, Optional, Tuple
+
+from utils.boxes import BoxArray
+from utils.coco import CocoWriter, ShardedCocoWriter, \
+    load_coco_by_file_name, shard_index_file_name
+from utils.coco_binary import CocoBinaryWriter
+from utils.coco_index import CocoIndexWriter, coco_index_file_name
+from utils.fs import mkdir_p
+from utils.ids import IdAllocator
+from utils.manifest import Manifest
+from utils.materialize import TRANSCODE_MODES, TranscodeOptions
+from utils.readers import DatasetReader, ImageRecord
+from utils.subset import label_summary_file_name, load_label_summary, \
+    save_label_summary
+from utils.yolo import YoloLabelWriter, format_yolo_labels
+
+
+class Sink(object):
+    """
+    Writes the records of a dataset reader in one output format. The
+    pipeline calls begin_fold with the number of images to convert and the
+    length of the full fold listing, then write (or reuse for an image which
+    is unchanged since the last run) for every image of the fold in order
+    and end_fold. If the conversion fails, abort is called instead of
+    end_fold.
+
+    image_options are the TranscodeOptions of the exported images, None to
+    export them as they are.
+
+    modality is the one of the reader's modalities the sink exports, by
+    default the first. The pipeline hands it the records of that modality
+    and materializes the image at image_source.
+
+    Every sink keeps a manifest of the source files next to its output, with
+    incremental set unchanged images are taken from the existing output.
+    The outputs of the images of the last run which are gone are removed at
+    the end of the fold.
+    """
+
+    # whether a sink is created for every modality of the reader
+    per_modality = True
+
+    def __init__(self, reader: DatasetReader, materialize: str,
+                 output_path: str, incremental: bool = False,
+                 manifest_hash: bool = False,
+                 modality: Optional[str] = None):
+        self.reader = reader
+        self.modality = modality if modality is not None else reader.modality
+        self.materialize = materialize
+        self.output_path = output_path
+        self.incremental = incremental
+        self.manifest_hash = manifest_hash
+        self.fold = None
+        self.listing_size = 0
+        self.manifest = None
+        self.image_options = None
+
+    def begin_fold(self, fold: str, num_images: int,
+                   listing_size: Optional[int] = None):
+        self.fold = fold
+        self.listing_size = listing_size if listing_size is not None \
+            else num_images
+
+    def image_source(self, image_path: str) -> str:
+        """
+        :return: the source image of the sink for the listed image_path
+        """
+        return self.reader.modality_path(image_path, self.modality)
+
+    def image_target(self, key: str) -> str:
+        """
+        :return: the path the source image key is materialized at
+        """
+        raise NotImplementedError()
+
+    def is_unchanged(self, key: str, files: List[str]) -> bool:
+        return self.incremental and \
+            (self.materialize == 'none' or
+             os.path.lexists(self.image_target(key))) and \
+            self.manifest.is_unchanged(key, files)
+
+    def outputs(self, key: str) -> List[str]:
+        """
+        :return: the files written for the source image key
+        """
+        return []
+
+    def reuse(self, index: int, key: str, files: List[str]):
+        self.manifest.record(key, files)
+
+    def write(self, record: ImageRecord):
+        self.manifest.record(record.key,
+                             [record.image_path, record.label_path])
+
+    def end_fold(self):
+        for key in self.manifest.stale():
+            for path in self.outputs(key):
+                if os.path.lexists(path):
+                    os.remove(path)
+        self.manifest.save()
+
+    def abort(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CocoSink(Sink):
+    """
+    Writes instances_{fold}{year}.json into output_path/annotations and the
+    images into output_path/{fold}{year}.
+
+    With shards > 1 the annotations are split into that many files
+    instances_{fold}{year}-{k}-of-{shards}.json with an index
+    instances_{fold}{year}.index.json, see ShardedCocoWriter. With binary
+    the annotations are also written as memory mappable arrays to
+    instances_{fold}{year}.cache, see CocoBinary. With lookup the relations
+    of images, annotations and categories are written to
+    instances_{fold}{year}.lookup.npz, see CocoIndex.
+
+    The image and annotation ids are assigned with the id_scheme of
+    IdAllocator.
+    """
+
+    def __init__(self, reader: DatasetReader, materialize: str,
+                 output_path: Optional[str] = None, shards: int = 1,
+                 binary: bool = False, lookup: bool = False,
+                 id_scheme: str = 'sequential',
+                 modality: Optional[str] = None, **kwargs):
+        if modality is None:
+            modality = reader.modality
+        if output_path is None:
+            output_path = os.path.join('.', reader.name, modality or '')
+        super(CocoSink, self).__init__(reader, materialize, output_path,
+                                       modality=modality, **kwargs)
+        self.categories = reader.categories.coco_categories()
+        self.shards = shards
+        self.binary = binary
+        self.binary_writer = None
+        self.lookup = lookup
+        self.index_writer = None
+        self.ids = IdAllocator(id_scheme)
+        self.previous = {}
+        self.writer = None
+
+    def begin_fold(self, fold: str, num_images: int,
+                   listing_size: Optional[int] = None):
+        super(CocoSink, self).begin_fold(fold, num_images, listing_size)
+        self.ids.begin_fold(fold, self.listing_size)
+        self.images_folder = os.path.join(
+            self.output_path, '{}{}'.format(fold, self.reader.year))
+        if not os.path.exists(self.images_folder):
+            mkdir_p(self.images_folder)
+        if not os.path.exists(os.path.join(self.output_path, 'annotations')):
+            mkdir_p(os.path.join(self.output_path, 'annotations'))
+
+        output_file = os.path.join(
+            self.output_path, 'annotations',
+            'instances_{}{}.json'.format(fold, self.reader.year))
+        self.manifest = Manifest(
+            '{}.manifest.json'.format(os.path.splitext(output_file)[0]),
+            with_hash=self.manifest_hash)
+        if self.shards > 1:
+            self.previous = load_coco_by_file_name(
+                shard_index_file_name(output_file)) \
+                if self.incremental else {}
+            self.writer = ShardedCocoWriter(
+                output_file, self.reader.info, self.reader.licenses,
+                self.categories, self.shards, num_images)
+        else:
+            self.previous = load_coco_by_file_name(output_file) \
+                if self.incremental else {}
+            self.writer = CocoWriter(output_file, self.reader.info,
+                                     self.reader.licenses, self.categories)
+        if self.binary:
+            self.binary_writer = CocoBinaryWriter(
+                '{}.cache'.format(os.path.splitext(output_file)[0]),
+                self.reader.info, self.reader.licenses, self.categories)
+        if self.lookup:
+            self.index_writer = CocoIndexWriter(
+                coco_index_file_name(output_file), self.categories)
+
+    def image_target(self, key: str) -> str:
+        return os.path.join(self.images_folder, self.reader.image_name(key))
+
+    def outputs(self, key: str) -> List[str]:
+        return [self.image_target(key)]
+
+    def is_unchanged(self, key: str, files: List[str]) -> bool:
+        return self.reader.image_name(key) in self.previous and \
+            super(CocoSink, self).is_unchanged(key, files)
+
+    def reuse(self, index: int, key: str, files: List[str]):
+        super(CocoSink, self).reuse(index, key, files)
+        # the ids are assigned as in a full run
+        obj_im, anns = self.previous[self.reader.image_name(key)]
+        image_id = self.ids.image_id(index, key)
+        first_id = self.ids.annotation_ids(image_id, len(anns))
+        obj_im = dict(obj_im, id=image_id)
+        for k, ann in enumerate(anns):
+            ann = dict(ann, image_id=image_id, id=first_id + k)
+            self.writer.add_annotation(ann)
+            if self.binary_writer is not None:
+                self.binary_writer.add_annotation(ann)
+        self.writer.add_image(obj_im)
+        if self.binary_writer is not None:
+            self.binary_writer.add_image(obj_im)
+        if self.index_writer is not None:
+            self.index_writer.add_image(
+                image_id, range(first_id, first_id + len(anns)),
+                [ann['category_id'] for ann in anns])
+
+    def write(self, record: ImageRecord):
+        super(CocoSink, self).write(record)
+        image_id = self.ids.image_id(record.index, record.key)
+        first_id = self.ids.annotation_ids(image_id, len(record.boxes))
+        obj_im = {
+            'license': 1,
+            'url': '',
+            'file_name': self.reader.image_name(record.key),
+            'height': record.height,
+            'width': record.width,
+            'date_captured': datetime.now().strftime('%Y-%m-%d %H:%M:00'),
+            'id': image_id
+        }
+        if self.binary_writer is not None:
+            self.binary_writer.add_annotations(
+                image_id, record.boxes, first_id)
+            self.binary_writer.add_image(obj_im)
+        self.writer.add_annotations(image_id, record.boxes, first_id)
+        self.writer.add_image(obj_im)
+        if self.index_writer is not None:
+            self.index_writer.add_image(
+                image_id, np.arange(first_id, first_id + len(record.boxes)),
+                record.boxes.label)
+
+    def end_fold(self):
+        self.writer.close()
+        if self.binary_writer is not None:
+            self.binary_writer.close()
+        if self.index_writer is not None:
+            self.index_writer.close()
+        super(CocoSink, self).end_fold()
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.abort()
+        if self.binary_writer is not None:
+            self.binary_writer.abort()
+        if self.index_writer is not None:
+            self.index_writer.abort()
+
+
+class YoloSink(Sink):
+    """
+    Writes the darknet layout: the images and one label file per image in
+    output_path[/modality]/images|labels/{fold}{year}, and the
+    {name}.data, {name}.names and per fold image lists in
+    output_path/data[/modality].
+
+    With label_archive the label files of a fold are packed into
+    labels/{fold}{year}.tar, see YoloLabelWriter. Archived labels are always
+    written again, incremental runs only skip the images.
+
+    image_size scales the images down to fit into (width, height) and
+    image_format ('.jpg' or '.png') and jpeg_quality set how they are
+    encoded. As the darknet labels are normalized by the image dimensions,
+    they hold for the resized images as well. Changed image settings are
+    not detected by incremental runs.
+    """
+
+    def __init__(self, reader: DatasetReader, materialize: str,
+                 output_path: Optional[str] = None,
+                 label_archive: bool = False, label_writers: int = 4,
+                 image_size: Optional[Tuple[int, int]] = None,
+                 image_format: Optional[str] = None,
+                 jpeg_quality: Optional[int] = None, **kwargs):
+        if output_path is None:
+            output_path = os.path.join('.', '{}_yolo'.format(reader.name))
+        super(YoloSink, self).__init__(reader, materialize, output_path,
+                                       **kwargs)
+        self.image_format = image_format
+        if image_size is not None or image_format is not None or \
+                jpeg_quality is not None:
+            if materialize not in TRANSCODE_MODES + ['none']:
+                raise ValueError('Images can not be resized or re-encoded '
+                                 'with materialization mode {}'.format(
+                                     materialize))
+            self.image_options = TranscodeOptions(
+                tuple(image_size) if image_size is not None else None,
+                jpeg_quality)
+        self.label_archive = label_archive
+        self.label_writers = label_writers
+        self.label_writer = None
+        self.prefix = os.path.join(output_path, self.modality or '')
+        self.data_folder = os.path.join(output_path, 'data',
+                                        self.modality or '')
+        if not os.path.exists(self.data_folder):
+            mkdir_p(self.data_folder)
+        self.fold_files = None
+
+        names_file = os.path.join(self.data_folder,
+                                  '{}.names'.format(reader.name))
+        with open(os.path.join(self.data_folder,
+                               '{}.data'.format(reader.name)), 'w') as f:
+            f.write('classes={}\n'.format(len(reader.categories.labels)))
+
+            for fold in reader.folds:
+                f.write('{}={}\n'.format(
+                    'train' if fold == 'train' else 'valid',
+                    os.path.abspath(self.fold_list(fold))
+                ))
+            f.write('names={}\n'.format(
+                os.path.relpath(names_file, output_path)))
+            f.write('backup=backup/\n')
+            f.write('eval={}\n'.format(reader.name))
+
+        with open(names_file, 'w') as f:
+            for label in reader.categories.labels:
+                f.write('{}\n'.format(label))
+
+    def fold_list(self, fold: str) -> str:
+        return os.path.join(self.data_folder, '{}_{}{}.txt'.format(
+            self.reader.name, fold, self.reader.year))
+
+    def begin_fold(self, fold: str, num_images: int,
+                   listing_size: Optional[int] = None):
+        super(YoloSink, self).begin_fold(fold, num_images, listing_size)
+        self.images_folder = os.path.join(
+            self.prefix, 'images', '{}{}'.format(fold, self.reader.year))
+        self.labels_folder = os.path.join(
+            self.prefix, 'labels', '{}{}'.format(fold, self.reader.year))
+        if not os.path.exists(self.images_folder):
+            mkdir_p(self.images_folder)
+        if not os.path.exists(self.labels_folder):
+            mkdir_p(self.labels_folder)
+
+        self.fold_files = open(self.fold_list(fold), 'w')
+        self.label_writer = YoloLabelWriter(
+            self.labels_folder, archive=self.label_archive,
+            workers=self.label_writers)
+        self.manifest = Manifest(
+            '{}.manifest.json'.format(self.labels_folder),
+            with_hash=self.manifest_hash)
+
+    def _file_name(self, key: str) -> str:
+        return '{}_{}{}_{}'.format(
+            self.reader.name, self.fold, self.reader.year, key)
+
+    def image_target(self, key: str) -> str:
+        name = self.reader.image_name(key)
+        if self.image_format is not None:
+            name = '{}{}'.format(os.path.splitext(name)[0], self.image_format)
+        return os.path.join(self.images_folder, self._file_name(name))
+
+    def label_target(self, key: str) -> str:
+        return os.path.join(self.labels_folder, '{}{}'.format(
+            self._file_name(os.path.splitext(key)[0]), '.txt'))
+
+    def outputs(self, key: str) -> List[str]:
+        return [self.image_target(key), self.label_target(key)]
+
+    def is_unchanged(self, key: str, files: List[str]) -> bool:
+        return not self.label_archive and \
+            os.path.exists(self.label_target(key)) and \
+            super(YoloSink, self).is_unchanged(key, files)
+
+    def reuse(self, index: int, key: str, files: List[str]):
+        super(YoloSink, self).reuse(index, key, files)
+        self.fold_files.write('{}\n'.format(
+            os.path.abspath(self.image_target(key))))
+
+    def write(self, record: ImageRecord):
+        super(YoloSink, self).write(record)
+        self.fold_files.write('{}\n'.format(
+            os.path.abspath(self.image_target(record.key))))
+        self.label_writer.write(
+            os.path.basename(self.label_target(record.key)),
+            format_yolo_labels(
+                record.boxes,
+                BoxArray.Normalizer(record.width, record.height)))
+
+    def end_fold(self):
+        self.fold_files.close()
+        self.label_writer.close()
+        super(YoloSink, self).end_fold()
+
+    def abort(self):
+        if self.fold_files is not None:
+            self.fold_files.close()
+        if self.label_writer is not None:
+            self.label_writer.close()
+
+
+class PairIndexSink(Sink):
+    """
+    Lists the exported RGB and depth images of another sink side by side,
+    one 'rgb path depth path' line per image in
+    output_path/{name}_{fold}{year}.txt, with absolute paths as the darknet
+    image lists. The rgb and depth sinks must come before it in the list of
+    sinks of the pipeline.
+    """
+
+    def __init__(self, reader: DatasetReader, rgb: Sink, depth: Sink,
+                 output_path: str, **kwargs):
+        super(PairIndexSink, self).__init__(reader, 'none', output_path,
+                                            **kwargs)
+        self.rgb = rgb
+        self.depth = depth
+        self.pairs_file = None
+
+    def begin_fold(self, fold: str, num_images: int,
+                   listing_size: Optional[int] = None):
+        super(PairIndexSink, self).begin_fold(fold, num_images, listing_size)
+        if not os.path.exists(self.output_path):
+            mkdir_p(self.output_path)
+        self.pairs_file = open(os.path.join(
+            self.output_path, '{}_{}{}.txt'.format(
+                self.reader.name, fold, self.reader.year)), 'w')
+
+    def image_target(self, key: str) -> str:
+        return self.rgb.image_target(key)
+
+    def is_unchanged(self, key: str, files: List[str]) -> bool:
+        # the index is always written again
+        return True
+
+    def _add(self, key: str):
+        self.pairs_file.write('{} {}\n'.format(
+            os.path.abspath(self.rgb.image_target(key)),
+            os.path.abspath(self.depth.image_target(key))))
+
+    def reuse(self, index: int, key: str, files: List[str]):
+        self._add(key)
+
+    def write(self, record: ImageRecord):
+        self._add(record.key)
+
+    def end_fold(self):
+        self.pairs_file.close()
+
+    def abort(self):
+        if self.pairs_file is not None:
+            self.pairs_file.close()
+
+
+class LabelSummarySink(Sink):
+    """
+    Writes the label summary of every fold to output_path/{fold}{year}.npz:
+    the number of boxes per category and the group of every exported image,
+    see utils/subset.py. Subset selects from it without reading any label.
+    The summary does not depend on the modality, so one sink covers all.
+    """
+    per_modality = False
+
+    def __init__(self, reader: DatasetReader, materialize: str,
+                 output_path: Optional[str] = None, **kwargs):
+        if output_path is None:
+            output_path = os.path.join('.', '{}_summary'.format(reader.name))
+        super(LabelSummarySink, self).__init__(reader, 'none', output_path,
+                                               **kwargs)
+        self.num_categories = len(reader.categories.labels)
+        self.previous = {}
+
+    def begin_fold(self, fold: str, num_images: int,
+                   listing_size: Optional[int] = None):
+        super(LabelSummarySink, self).begin_fold(fold, num_images,
+                                                 listing_size)
+        if not os.path.exists(self.output_path):
+            mkdir_p(self.output_path)
+        self.summary_file = label_summary_file_name(
+            self.output_path, fold, self.reader.year)
+        self.manifest = Manifest(
+            '{}.manifest.json'.format(os.path.splitext(self.summary_file)[0]),
+            with_hash=self.manifest_hash)
+        self.previous = {}
+        if self.incremental and os.path.exists(self.summary_file):
+            keys, counts, groups = load_label_summary(self.summary_file)
+            self.previous = {key: (c, g.decode('utf-8'))
+                             for key, c, g in zip(keys, counts, groups)}
+        self.keys = []
+        self.counts = []
+        self.groups = []
+
+    def image_target(self, key: str) -> str:
+        return os.path.join(self.output_path, key)
+
+    def is_unchanged(self, key: str, files: List[str]) -> bool:
+        return key in self.previous and \
+            super(LabelSummarySink, self).is_unchanged(key, files)
+
+    def reuse(self, index: int, key: str, files: List[str]):
+        super(LabelSummarySink, self).reuse(index, key, files)
+        counts, group = self.previous[key]
+        self.keys += [key]
+        self.counts += [counts]
+        self.groups += [group]
+
+    def write(self, record: ImageRecord):
+        super(LabelSummarySink, self).write(record)
+        self.keys += [record.key]
+        self.counts += [np.bincount(record.boxes.label,
+                                    minlength=self.num_categories + 1)[1:]]
+        self.groups += [self.reader.group(record.key)]
+
+    def end_fold(self):
+        save_label_summary(self.summary_file, self.keys,
+                           np.array(self.counts, dtype=np.int32).reshape(
+                               len(self.keys), self.num_categories),
+                           self.groups)
+        super(LabelSummarySink, self).end_fold()
+
+
+SINKS = {
+    'coco': CocoSink,
+    'yolo': YoloSink,
+    'summary': LabelSummarySink,
+}
@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+from typing import List, Optional, Tuple
+
+STRATIFICATIONS = ['category', 'sequence']
+
+
+def label_summary_file_name(folder: str, fold: str, year) -> str:
+    return os.path.join(folder, '{}{}.npz'.format(fold, year))
+
+
+def save_label_summary(path: str, keys: List[str], counts: np.ndarray,
+                       groups: List[Optional[str]]):
+    """
+    Writes the label summary of a fold: the image keys, the number of boxes
+    per image and category (n, categories) and the group of every image,
+    e.g. the InOutDoor sequence, '' if there is none.
+    """
+    tmp_file = '{}.tmp.npz'.format(os.path.splitext(path)[0])
+    np.savez(tmp_file,
+             keys=np.array([k.encode('utf-8') for k in keys], dtype=bytes),
+             counts=np.asarray(counts, dtype=np.int32),
+             groups=np.array([(g or '').encode('utf-8') for g in groups],
+                             dtype=bytes))
+    os.replace(tmp_file, path)
+
+
+def load_label_summary(path: str) -> Tuple[List[str], np.ndarray,
+                                           np.ndarray]:
+    """
+    :return: (keys, counts, groups) as written by save_label_summary
+    """
+    with np.load(path) as obj:
+        keys = [k.decode('utf-8') for k in obj['keys'].tolist()]
+        return keys, obj['counts'], obj['groups']
+
+
+def _allocate(sizes: np.ndarray, k: int) -> np.ndarray:
+    """
+    Splits k over strata of the given sizes proportionally, by largest
+    remainder.
+    """
+    quota = sizes * (k / sizes.sum())
+    res = np.floor(quota).astype(np.int64)
+    rest = k - res.sum()
+    if rest > 0:
+        order = np.argsort(-(quota - res), kind='stable')
+        res[order[:rest]] += 1
+    return np.minimum(res, sizes)
+
+
+def stratify_by_category(counts: np.ndarray) -> np.ndarray:
+    """
+    Assigns every image to the rarest category among its boxes, images
+    without boxes get a stratum of their own.
+
+    :return: the stratum of every image
+    """
+    present = counts > 0
+    frequency = present.sum(axis=0).astype(np.float64)
+    rarity = np.where(present, frequency, np.inf)
+    return np.where(present.any(axis=1), rarity.argmin(axis=1),
+                    counts.shape[1])
+
+
+class Subset(object):
+    """
+    Selects a random subset of every fold from the label summaries written
+    by LabelSummarySink, so a subset is chosen without parsing any label
+    file. The selection only depends on the summary, size or fraction and
+    seed.
+
+    size is the number of images per fold, fraction the share of the
+    images of the summary, one of both is given. With stratify the images
+    are drawn proportionally from the strata: the InOutDoor sequences or
+    the rarest category of every image, see stratify_by_category.
+    """
+
+    def __init__(self, summary_folder: str, size: Optional[int] = None,
+                 fraction: Optional[float] = None, seed: int = 0,
+                 stratify: Optional[str] = None):
+        if (size is None) == (fraction is None):
+            raise ValueError('Either the size or the fraction of the subset '
+                             'is required')
+        if fraction is not None and not 0 < fraction <= 1:
+            raise ValueError('Invalid fraction {}'.format(fraction))
+        if stratify is not None and stratify not in STRATIFICATIONS:
+            raise ValueError('Unknown stratification: {}'.format(stratify))
+        self.summary_folder = summary_folder
+        self.size = size
+        self.fraction = fraction
+        self.seed = seed
+        self.stratify = stratify
+
+    def select_keys(self, fold: str, year) -> List[str]:
+        """
+        :return: the keys of the selected images of fold, in summary order
+        """
+        path = label_summary_file_name(self.summary_folder, fold, year)
+        if not os.path.isfile(path):
+            raise ValueError('No label summary of {}{} at {}, write it with '
+                             '--format summary first'.format(fold, year,
+                                                             path))
+        keys, counts, groups = load_label_summary(path)
+        n = len(keys)
+        k = min(n, self.size) if self.size is not None else \
+            int(round(self.fraction * n))
+        if k == 0:
+            return []
+        rng = np.random.RandomState(self.seed)
+
+        if self.stratify is None:
+            selected = rng.choice(n, k, replace=False)
+        else:
+            if self.stratify == 'category':
+                strata = stratify_by_category(counts)
+            else:
+                if n and not groups.all():
+                    raise ValueError('The summary of {} has no sequences to '
+                                     'stratify by'.format(fold))
+                strata = np.unique(groups, return_inverse=True)[1]
+            members = np.argsort(strata, kind='stable')
+            sizes = np.bincount(strata)
+            starts = np.concatenate([[0], np.cumsum(sizes)])
+            selected = np.concatenate(
+                [rng.choice(members[starts[s]:starts[s + 1]], m,
+                            replace=False)
+                 for s, m in enumerate(_allocate(sizes, k))] +
+                [np.zeros(0, dtype=np.int64)])
+        return [keys[i] for i in np.sort(selected)]
+
+    def select(self, fold: str, year,
+               pairs: List[Tuple[int, str, str]]) \
+            -> List[Tuple[int, str, str]]:
+        """
+        :return: the listed pairs of the selected images
+        """
+        keys = set(self.select_keys(fold, year))
+        return [pair for pair in pairs
+                if os.path.basename(pair[1]) in keys]
@@ -0,0 +1,96 @@
+import io
+import itertools
+import os
+import tarfile
+
+import numpy as np
+from typing import Tuple
+
+from utils.boxes import BoxArray
+from utils.prefetch import BackgroundWriter
+
+YOLO_LINE = '{} {} {} {} {}\n'
+
+
+def format_yolo_labels(boxes: BoxArray, normalization) -> str:
+    """
+    Builds the content of a darknet label file, one line
+    'class cx cy w h' per box with the coordinates divided by the image
+    dimensions of normalization. The class is the category id - 1.
+    The whole file is formatted with a single format call.
+    """
+    return format_yolo_lines(boxes.label - 1, boxes.to_xcycwh(normalization))
+
+
+def format_yolo_lines(classes: np.ndarray, xcycwh: np.ndarray) -> str:
+    """
+    Builds the content of a darknet label file from the classes and the
+    normalized (n, 4) cx, cy, w, h boxes.
+    """
+    labels = classes.tolist()
+    return (YOLO_LINE * len(labels)).format(
+        *itertools.chain.from_iterable(zip(labels, *xcycwh.T.tolist())))
+
+
+def parse_yolo_lines(content: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: the classes and the (n, 4) cx, cy, w, h boxes of the content
+        of a darknet label file
+    """
+    values = np.array(content.split(), dtype=np.float64).reshape(-1, 5)
+    return values[:, 0].astype(np.int64), values[:, 1:]
+
+
+class YoloLabelWriter(object):
+    """
+    Writes the label files of a fold. Files are written by a small thread
+    pool with at most max_pending writes in flight, each file is closed right
+    after it is written. With archive set, all label files go into a single
+    uncompressed tar archive {labels_folder}.tar instead, for file systems
+    which handle many small files badly. The archive of the same labels is
+    the same on every run.
+
+    close() waits for all pending writes and raises the first error.
+    """
+
+    def __init__(self, labels_folder: str, archive: bool = False,
+                 workers: int = 4, max_pending: int = 64):
+        self.labels_folder = labels_folder
+        self.archive = None
+        self.writer = None
+        if archive:
+            self.archive = tarfile.open('{}.tar'.format(labels_folder), 'w')
+        elif workers > 1:
+            self.writer = BackgroundWriter(workers, max_pending,
+                                           name='label-writer')
+
+    @staticmethod
+    def _write_file(path: str, content: str):
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def write(self, file_name: str, content: str):
+        if self.archive is not None:
+            data = content.encode('utf-8')
+            info = tarfile.TarInfo(file_name)
+            info.size = len(data)
+            # a fixed time, the archive only depends on the labels
+            info.mtime = 0
+            self.archive.addfile(info, io.BytesIO(data))
+        elif self.writer is not None:
+            self.writer.submit(
+                self._write_file,
+                os.path.join(self.labels_folder, file_name), content)
+        else:
+            self._write_file(os.path.join(self.labels_folder, file_name),
+                             content)
+
+    def close(self):
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            finally:
+                self.writer = None
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None